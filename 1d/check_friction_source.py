@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+r"""Check the SharpClaw increment returned by the friction source term
+
+Evaluates `multilayer.step.friction_source` as a SharpClaw dq_src on a state
+with wet, bottom dry and fully dry cells and reports whether the increment is
+zero for a zero time step, finite everywhere and only ever reduces the
+momentum of the active layer.
+
+"""
+
+import numpy as np
+
+import clawpack.pyclaw as pyclaw
+
+import multilayer as ml
+
+class Stub(object):
+    r"""Minimal stand in for the state attributes used by the source term"""
+    def __init__(self,**kargs):
+        self.__dict__.update(kargs)
+
+
+def friction_state(num_cells=50,manning=0.025):
+    r"""State with both layers wet, the bottom layer dry and both dry"""
+
+    rho = [0.95,1.0]
+    x = np.linspace(0.0,1.0,num_cells)
+    h = np.empty((2,num_cells))
+    h[0,:] = 1.0 + x
+    h[1,:] = np.where(x < 0.5,2.0 - x,0.0)
+    h[:,-5:] = 0.0
+    u = np.empty((2,num_cells))
+    u[0,:] = np.sin(2.0 * np.pi * x)
+    u[1,:] = -0.5 * np.cos(2.0 * np.pi * x)
+
+    q = np.empty((4,num_cells),order='F')
+    for layer in xrange(2):
+        q[2 * layer,:] = rho[layer] * h[layer,:]
+        q[2 * layer + 1,:] = rho[layer] * h[layer,:] * u[layer,:]
+    problem_data = {'rho':rho,'g':9.8,'manning':manning,
+                    'dry_tolerance':1e-3}
+    return Stub(q=q,problem_data=problem_data)
+
+
+def check_zero_dt():
+    r"""Return True if a zero time step gives a zero increment"""
+    solver = pyclaw.SharpClawSolver1D()
+    dq = ml.step.friction_source(solver,friction_state(),0.0)
+    return np.all(dq == 0.0)
+
+
+def check_damping(dt=10.0):
+    r"""Return True if the increment is finite and only reduces momentum"""
+    solver = pyclaw.SharpClawSolver1D()
+    state = friction_state()
+    dq = ml.step.friction_source(solver,state,dt)
+    momenta = state.q[1::2,:]
+    return (np.all(np.isfinite(dq)) and np.all(dq[0::2,:] == 0.0)
+            and np.all(np.abs(momenta + dq[1::2,:]) <= np.abs(momenta))
+            and np.all((momenta + dq[1::2,:]) * momenta >= 0.0))
+
+
+if __name__ == "__main__":
+    for (name,check) in [("zero dt",check_zero_dt),("damping",check_damping)]:
+        print "%s: %s" % (name,"ok" if check() else "FAILED")
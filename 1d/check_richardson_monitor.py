@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+r"""Check that the Richardson monitor checks kappa on steps ending on output
+
+Steps through a run with a fixed time step, shortened to land on each output
+time as `Controller.run` does, for each output style and reports whether
+`multilayer.step.RichardsonMonitor` checked kappa on every step that ends on
+an output time.  The step and interval are chosen so that the interval alone
+would miss the final output time.
+
+"""
+
+import numpy as np
+
+import multilayer as ml
+
+class Stub(object):
+    r"""Minimal stand in for the solver, state and controller attributes"""
+    def __init__(self,**kargs):
+        self.__dict__.update(kargs)
+
+
+def output_steps(monitor,out_times,dt,t0=0.0):
+    r"""Step from *t0* through *out_times* returning (t_end, checked) pairs"""
+
+    state = Stub(t=t0)
+    solver = Stub(dt=dt)
+    steps = []
+    for t_out in out_times:
+        while state.t < t_out - 1e-14:
+            solver.dt = min(dt,t_out - state.t)
+            checked = monitor.due(solver,state,1e-3)
+            state.t += solver.dt
+            steps.append((state.t,checked))
+    return steps
+
+
+def check_output_style(output_style,dt=0.7,interval=10):
+    r"""Return True if every step ending on an output time was checked"""
+
+    # out_times is only used by PyClaw for output_style 2, otherwise it keeps
+    # its default value
+    if output_style == 2:
+        out_times = [0.0,2.5,10.0]
+    else:
+        out_times = np.linspace(0.0,1.0,10)
+    controller = Stub(output_style=output_style,tfinal=10.0,num_output_times=1,
+                      out_times=out_times,nstepout=4,solution=Stub(t=0.0))
+    monitor = ml.step.RichardsonMonitor(interval=interval,
+                                        controller=controller)
+    if output_style == 1:
+        out_times = np.linspace(0.0,controller.tfinal,
+                                controller.num_output_times + 1)[1:]
+    elif output_style == 2:
+        out_times = controller.out_times[1:]
+    else:
+        out_times = [controller.tfinal]
+    steps = output_steps(monitor,out_times,dt)
+
+    if output_style == 3:
+        output_step = [(n + 1) % controller.nstepout == 0
+                                                for n in xrange(len(steps))]
+    else:
+        output_step = [np.any(np.abs(np.array(out_times) - t_end) < 1e-12)
+                                                for (t_end,checked) in steps]
+    return all(checked for ((t_end,checked),on_output)
+                                in zip(steps,output_step) if on_output)
+
+
+if __name__ == "__main__":
+    for output_style in [1,2,3]:
+        print "output_style %s: %s" % (output_style,
+                                  "ok" if check_output_style(output_style)
+                                       else "FAILED")
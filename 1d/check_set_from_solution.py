@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+r"""Check restarting from a previous run's output with and without aux files
+
+Writes a frame of a two-layer state to a temporary output directory, once
+with the aux array and once without it as runs made with write_aux_init only
+do for every frame after the first, and reports whether
+`multilayer.qinit.set_from_solution` remaps q onto a finer grid conserving
+the integral of each field, and remaps the dynamic aux fields only when they
+were written.
+
+"""
+
+import shutil
+import tempfile
+
+import numpy as np
+
+import clawpack.pyclaw as pyclaw
+
+import multilayer as ml
+
+def create_state(num_cells,num_layers=2):
+    r"""Create a two-layer state on [0,1] with smooth q and dynamic aux"""
+
+    x = pyclaw.Dimension(0.0,1.0,num_cells)
+    domain = pyclaw.Domain([x])
+    state = pyclaw.State(domain,2 * num_layers,ml.aux.num_aux(num_layers))
+    state.problem_data['num_layers'] = num_layers
+    return state
+
+
+def write_frame(path,write_aux,num_cells=40):
+    r"""Write frame 1 of a smooth state to *path* and return the state"""
+
+    state = create_state(num_cells)
+    x = state.grid.dimensions[0].centers
+    for m in xrange(state.num_eqn):
+        state.q[m,:] = 1.0 + 0.5 * np.sin(2.0 * np.pi * (m + 1) * x)
+    state.aux[...] = 0.0
+    layout = ml.layout.Layout(state.problem_data['num_layers'])
+    layout.wind(state)[...] = np.cos(2.0 * np.pi * x)
+    layout.kappa(state)[...] = x
+    state.t = 2.5
+    solution = pyclaw.Solution(state,pyclaw.Domain(state.grid.dimensions))
+    solution.write(1,path,write_aux=write_aux)
+    return state
+
+
+def check_restart(write_aux,num_cells=100):
+    r"""Return True if the restart from a frame written as given succeeds"""
+
+    path = tempfile.mkdtemp()
+    try:
+        source = write_frame(path,write_aux)
+        state = create_state(num_cells)
+        state.aux[...] = -1.0
+        t = ml.qinit.set_from_solution(state,path,1)
+    finally:
+        shutil.rmtree(path)
+
+    source_delta = source.grid.delta[0]
+    delta = state.grid.delta[0]
+    conserved = np.allclose(np.sum(state.q,axis=1) * delta,
+                            np.sum(source.q,axis=1) * source_delta)
+    dynamic_indices = ml.output.SplitAuxOutput(2).dynamic_indices
+    if write_aux:
+        aux_set = np.allclose(np.sum(state.aux[dynamic_indices,:],axis=1)
+                                                                    * delta,
+                              np.sum(source.aux[dynamic_indices,:],axis=1)
+                                                            * source_delta)
+    else:
+        aux_set = np.all(state.aux == -1.0)
+    return t == source.t and conserved and aux_set
+
+
+if __name__ == "__main__":
+    for write_aux in [True,False]:
+        print "%s aux: %s" % ("with" if write_aux else "without",
+                              "ok" if check_restart(write_aux) else "FAILED")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+r"""Benchmark the Manning's-N friction source term
+
+Compares the original per-cell loop implementation of the friction source term
+against the array implementation in `multilayer.step.friction_source`, checks
+that both give bit-for-bit identical results and reports the number of source
+term evaluations per second for a range of grid sizes.
+
+"""
+
+import sys
+import time
+
+import numpy as np
+
+import clawpack.pyclaw as pyclaw
+
+import multilayer as ml
+
+def friction_source_loop(solver,state,dt,TOLERANCE=1e-30):
+    r"""Original per-cell loop version of the friction source term"""
+
+    manning = state.problem_data['manning']
+    g = state.problem_data['g']
+    rho = state.problem_data['rho']
+    dry_tolerance = state.problem_data['dry_tolerance']
+
+    if manning > TOLERANCE:
+        for i in xrange(state.q.shape[1]):
+            h = state.q[2,i] / rho[1]
+            if h < dry_tolerance:
+                h = state.q[0,i] / rho[0]
+                u = state.q[1,i] / rho[0]
+                layer_index = 0
+            else:
+                u = state.q[2,i] / rho[1]
+                layer_index = 1
+
+            gamma = u * g * manning**2 / h**(4/3)
+            dgamma = 1.0 + dt * gamma
+            hu_index = 2 * (layer_index) + 1
+            state.q[hu_index,i] = state.q[hu_index,i] / dgamma * rho[layer_index]
+
+
+def create_state(num_cells):
+    r"""Create a two-layer state with a partially dry bottom layer"""
+
+    num_layers = 2
+    x = pyclaw.Dimension(0.0, 1.0, num_cells)
+    domain = pyclaw.Domain([x])
+    state = pyclaw.State(domain, 2 * num_layers, ml.aux.num_aux(num_layers))
+
+    state.problem_data['g'] = 9.8
+    state.problem_data['manning'] = 0.025
+    state.problem_data['rho'] = [0.95, 1.0]
+    state.problem_data['dry_tolerance'] = 1e-3
+
+    # Bottom layer is dry over the right half of the domain
+    x = state.grid.dimensions[0].centers
+    rho = state.problem_data['rho']
+    state.q[0,:] = rho[0] * (0.4 + 0.1 * np.sin(2.0 * np.pi * x))
+    state.q[1,:] = rho[0] * 0.05 * np.cos(2.0 * np.pi * x)
+    state.q[2,:] = (x < 0.5) * rho[1] * 0.6
+    state.q[3,:] = (x < 0.5) * rho[1] * 0.02 * np.sin(4.0 * np.pi * x)
+
+    return state
+
+
+def time_source(source,solver,state,dt,num_calls):
+    r"""Return the number of calls per second of the source term"""
+
+    start = time.time()
+    for n in xrange(num_calls):
+        source(solver,state,dt)
+    return num_calls / (time.time() - start)
+
+
+def run_benchmark(resolutions=[500,2000,20000],num_calls=200,dt=1e-4):
+    r"""Run the comparison for each of the grid sizes in resolutions"""
+
+    # Time the NumPy code, the compiled kernels are used for 'Fortran'
+    solver = pyclaw.ClawSolver1D()
+    solver.kernel_language = 'Python'
+
+    print "%10s | %15s | %15s | %8s | %s" % ("cells", "loop (steps/s)",
+                                         "array (steps/s)", "speedup",
+                                         "identical")
+    print "-" * 72
+    for num_cells in resolutions:
+        # Check that the two implementations agree exactly
+        loop_state = create_state(num_cells)
+        array_state = create_state(num_cells)
+        friction_source_loop(solver, loop_state, dt)
+        ml.step.friction_source(solver, array_state, dt)
+        identical = np.array_equal(loop_state.q, array_state.q)
+
+        # Timings
+        state = create_state(num_cells)
+        loop_rate = time_source(friction_source_loop, solver, state, dt,
+                                max(num_calls * 500 / num_cells, 1))
+        state = create_state(num_cells)
+        array_rate = time_source(ml.step.friction_source, solver, state, dt,
+                                 num_calls)
+
+        print "%10s | %15.1f | %15.1f | %8.1f | %s" % (num_cells, loop_rate,
+                                                array_rate,
+                                                array_rate / loop_rate,
+                                                identical)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run_benchmark([int(value) for value in sys.argv[1:]])
+    else:
+        run_benchmark()
@@ -38,7 +38,7 @@ matplotlib.rcParams['savefig.dpi'] = 100
 # Import plotting package now
 import matplotlib.pyplot as plt
 
-from clawpack.pyclaw.solution import Solution
+from multilayer.output import read_solution
 
 # General parameters
 data_path = os.path.abspath(os.environ["DATA_PATH"])
@@ -185,7 +185,7 @@ def create_convergence_plot(base_path, eigen_methods=[1,2,3,4],
     path = os.path.join(data_path,base_path,
                                     'ml_e%s_n%s_output' % (4,base_resolution))
     x_base,b_base,h_base,eta_base,u_base = \
-                        extract_data(Solution(frame,path=path,read_aux=True))
+                        extract_data(read_solution(frame,path=path))
 
     # Calculate errors
     for (m,method) in enumerate(eigen_methods):
@@ -194,7 +194,7 @@ def create_convergence_plot(base_path, eigen_methods=[1,2,3,4],
             # Load solution and extract data        
             path = os.path.join(data_path,base_path,
                                 'ml_e%s_n%s_output' % (method,resolution))
-            x,b,h,eta,u = extract_data(Solution(frame,path=path,read_aux=True))
+            x,b,h,eta,u = extract_data(read_solution(frame,path=path))
 
             error[0,m,n] = norm(h[0][:] - np.interp(x,x_base,h_base[0][:]))
             error[1,m,n] = norm(h[1][:] - np.interp(x,x_base,h_base[1][:]))
@@ -258,7 +258,7 @@ def create_eigen_plot(base_path,eigen_methods=[1,2,3,4],resolution=64):
         # Load solution and extract data        
         path = os.path.join(data_path,base_path,
                             'ml_e%s_n%s_output' % (method,resolution))
-        x,b,h,eta,u = extract_data(Solution(frame,path=path,read_aux=True))
+        x,b,h,eta,u = extract_data(read_solution(frame,path=path))
 
         # Plot data
         axes_list[0].plot(x,eta[0],styles[n],label='_nolegend_')
@@ -269,7 +269,7 @@ def create_eigen_plot(base_path,eigen_methods=[1,2,3,4],resolution=64):
     # Plot reference solutions
     path = os.path.join(data_path,base_path,
                                 'ml_e%s_n%s_output' % (4,base_resolution))
-    x,b,h,eta,u = extract_data(Solution(frame,path=path,read_aux=True))
+    x,b,h,eta,u = extract_data(read_solution(frame,path=path))
     axes_list[0].plot(x,eta[0],'k',label='_nolegend_')
     axes_list[0].plot(x,eta[1],'k',label='Base')
     # axes_list[0].plot(x,b,'k:',label="bathymetry")
@@ -310,7 +310,7 @@ def create_resolution_plot(base_path,method=2,resolutions=[64,128,256,512]):
         # Load solution and extract data        
         path = os.path.join(data_path,base_path,
                             'ml_e%s_n%s_output' % (method,resolution))
-        x,b,h,eta,u = extract_data(Solution(frame,path=path,read_aux=True))
+        x,b,h,eta,u = extract_data(read_solution(frame,path=path))
 
         # Plot data
         axes_list[0].plot(x,eta[0],styles[n],label='_nolegend_')
@@ -321,7 +321,7 @@ def create_resolution_plot(base_path,method=2,resolutions=[64,128,256,512]):
     # Plot reference solutions
     path = os.path.join(data_path,base_path,
                                 'ml_e%s_n%s_output' % (base_method,base_resolution))
-    x,b,h,eta,u = extract_data(Solution(frame,path=path,read_aux=True))
+    x,b,h,eta,u = extract_data(read_solution(frame,path=path))
     axes_list[0].plot(x,eta[0],'k',label='_nolegend_')
     axes_list[0].plot(x,eta[1],'k',label='Base')
     # axes_list[0].plot(x,b,'k:',label="bathymetry")
@@ -3,9 +3,16 @@ Package containing various functions related to the multilayer shallow
 water equations.
 """
 
-__all__ = ['aux','bc','qinit','step']
+__all__ = ['aux','bc','diagnostics','eigen','kernels','layout','output','qinit',
+           'step','timing']
 
 import aux
 import bc
+import diagnostics
+import eigen
+import kernels
+import layout
+import output
 import qinit
-import step
\ No newline at end of file
+import step
+import timing
\ No newline at end of file
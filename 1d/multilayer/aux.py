@@ -3,36 +3,73 @@
 r"""Modules contains information about the aux array used in the multi-layer
 swe computations."""
 
+import os
+
 import numpy as np
 
-# Define aux array indices
+# Define aux array indices, the h_hat and kappa indices are for two layers
 bathy_index = 0
 wind_index = 1
 h_hat_index = [2,3]
 kappa_index = 4
 
+def h_hat_slice(num_layers):
+    r"""Slice of the aux array containing h_hat for each layer"""
+    return slice(2,2 + num_layers)
+
+def kappa_slice(num_layers):
+    r"""Slice of the aux array containing kappa for each internal interface"""
+    return slice(2 + num_layers,1 + 2 * num_layers)
+
+def num_aux(num_layers):
+    r"""Number of aux array fields needed for *num_layers* layers"""
+    return 1 + 2 * num_layers
+
 # ==============================================
 # = Sets values of h_hat for linearized solver =
 # ==============================================
 def set_h_hat(state,jump_location,eta_left,eta_right):
-    """Set the initial surfaces for Riemann solver use"""
+    """Set the initial surfaces for Riemann solver use
+    
+    The surfaces are *eta_left* left of *jump_location* and *eta_right* to 
+    the right, see :func:`set_piecewise_h_hat`.
+    """
+    set_piecewise_h_hat(state,[jump_location],[eta_left,eta_right])
+
+
+def set_piecewise_h_hat(state,breakpoints,etas):
+    r"""Set the initial surfaces for Riemann solver use piecewise in x
+    
+    The domain is split into len(breakpoints) + 1 segments, a cell belongs to
+    segment k if breakpoints[k-1] <= x < breakpoints[k].  In each segment the
+    surfaces of the layers, from the top down, are given by the corresponding 
+    row of *etas*.  Internal surfaces lying below the bathymetry are moved up
+    to it so that the layers below are dry.  The number of layers is taken
+    from the length of the rows of *etas*.
+    
+    :Input:
+     - *state* (:class:pyclaw.state.State)
+     - *breakpoints* (list) - Increasing locations of the segment boundaries.
+     - *etas* (list) - List of the surfaces of each layer for each segment.
+    """
+    
+    etas = np.asarray(etas,dtype=float)
+    if etas.ndim != 2 or etas.shape[0] != len(breakpoints) + 1:
+        raise ValueError("Need one row of surfaces for each of the %s "
+                         "segments." % (len(breakpoints) + 1))
+    num_layers = etas.shape[1]
+
+    x = state.grid.dimensions[0].centers
     b = state.aux[bathy_index,:]
+    
+    # Surfaces in each cell with the internal surfaces limited by bathymetry
+    segment = np.searchsorted(breakpoints,x,side='right')
+    eta = etas[segment,:].T
+    np.maximum(eta[1:,:],b,out=eta[1:,:])
 
-    for (i,x) in enumerate(state.grid.dimensions[0].centers):
-        if x < jump_location:
-            if eta_left[1] > b[i]:
-                state.aux[h_hat_index[0],i] = eta_left[0] - eta_left[1]
-                state.aux[h_hat_index[1],i] = eta_left[1] - b[i]
-            else:
-                state.aux[h_hat_index[0],i] = eta_left[0] - b[i]
-                state.aux[h_hat_index[1],i] = 0.0
-        else:
-            if eta_right[1] > b[i]:
-                state.aux[h_hat_index[0],i] = eta_right[0] - eta_right[1]
-                state.aux[h_hat_index[1],i] = eta_right[1] - b[i]
-            else:
-                state.aux[h_hat_index[0],i] = eta_right[0] - b[i]
-                state.aux[h_hat_index[1],i] = 0.0
+    h_hat = state.aux[h_hat_slice(num_layers),:]
+    h_hat[:-1,:] = eta[:-1,:] - eta[1:,:]
+    h_hat[-1,:] = eta[-1,:] - b
 
 
 # ==================
@@ -59,9 +96,297 @@ def set_oscillatory_wind(state,A=5.0,N=2.0,omega=2.0,t_length=10.0):
                        * np.sin(2.0*np.pi*omega/t_length*state.t)
 
 
+class SeparableWind(object):
+    r"""Wind field made up of a sum of separable modes
+
+    The wind field is :math:`\sum_k X_k(x) T_k(t)` where each mode is given 
+    as a pair of functions *(spatial,temporal)*.  The spatial profiles 
+    :math:`X_k` are evaluated once per grid, with the grid as the argument, 
+    and each call then only evaluates the scalar temporal factors 
+    :math:`T_k(t)` and writes the field into aux[wind_index,:] in place.  An 
+    instance can be used as the *wind_func* of 
+    :func:`multilayer.step.before_step`.
+
+    :Input:
+     - *modes* (list) - List of *(spatial,temporal)* function pairs.
+    """
+
+    def __init__(self,modes):
+        self.modes = list(modes)
+        self._grid = None
+        self._profiles = None
+        self._work = None
+
+    def add_mode(self,spatial,temporal):
+        r"""Add the mode *spatial(grid) * temporal(t)* to the field"""
+        self.modes.append((spatial,temporal))
+        self._grid = None
+
+    def profiles(self,grid):
+        r"""Return the spatial profiles on *grid*, computing them if needed"""
+        if grid is not self._grid:
+            num_cells = grid.dimensions[0].num_cells
+            self._profiles = np.empty((len(self.modes),num_cells))
+            for (k,(spatial,temporal)) in enumerate(self.modes):
+                self._profiles[k,:] = spatial(grid)
+            self._work = np.empty(num_cells)
+            self._grid = grid
+        return self._profiles
+
+    def __call__(self,state):
+        profiles = self.profiles(state.grid)
+        wind = state.aux[wind_index,:]
+        if len(self.modes) == 0:
+            wind[...] = 0.0
+            return
+        np.multiply(profiles[0,:],self.modes[0][1](state.t),out=wind)
+        for (k,(spatial,temporal)) in enumerate(self.modes[1:]):
+            np.multiply(profiles[k + 1,:],temporal(state.t),out=self._work)
+            np.add(wind,self._work,out=wind)
+
+
+class OscillatoryWind(SeparableWind):
+    r"""Separable version of :func:`set_oscillatory_wind`
+
+    The field :math:`A \sin(\pi N x / L) \sin(2 \pi \omega t / t_{length})`
+    is the same as that set by :func:`set_oscillatory_wind` but the spatial
+    factor is only computed once.
+    """
+
+    def __init__(self,A=5.0,N=2.0,omega=2.0,t_length=10.0):
+        def spatial(grid):
+            L = grid.upper[0] - grid.lower[0]
+            x = grid.dimensions[0].centers
+            return A * np.sin(np.pi*N*x/L)
+        def temporal(t):
+            return np.sin(2.0*np.pi*omega/t_length*t)
+        super(OscillatoryWind,self).__init__([(spatial,temporal)])
+
+
+class GriddedWind(object):
+    r"""Wind field interpolated in time from records stored on disk
+
+    The wind records are a (time x cells) array stored either as a `.npy` 
+    file or as raw binary and are accessed through a memory map.  Only the 
+    two records bracketing the current time are read into memory, the field
+    is interpolated linearly in time between them and written into 
+    aux[wind_index,:] in place.  Before the first and after the last record
+    time the field is held constant.  An instance can be used as the 
+    *wind_func* of :func:`multilayer.step.before_step`.
+
+    :Input:
+     - *path* (string) - Path to the wind records.
+     - *times* (array) - Increasing times of the records.
+     - *num_cells* (int) - Number of cells in each record, only needed for 
+       raw binary files.
+     - *dtype* (string) - Data type of raw binary files, default is 'float64'.
+    """
+
+    def __init__(self,path,times,num_cells=None,dtype='float64'):
+        self.times = np.asarray(times,dtype=float)
+        if path.endswith('.npy'):
+            self.records = np.load(path,mmap_mode='r')
+        else:
+            if num_cells is None:
+                raise ValueError("num_cells is required for raw binary files.")
+            self.records = np.memmap(path,dtype=dtype,mode='r',
+                                     shape=(len(self.times),num_cells))
+        if self.records.ndim != 2 or self.records.shape[0] != len(self.times):
+            raise ValueError("Wind records have shape %s but there are %s "
+                             "record times." % (self.records.shape,
+                                                len(self.times)))
+        
+        self.num_cells = self.records.shape[1]
+        self._slabs = np.empty((2,self.num_cells))
+        self._difference = np.zeros(self.num_cells)
+        self._index = None
+
+    def _load(self,index):
+        r"""Load the records *index* and *index + 1* if not already loaded"""
+        if index == self._index:
+            return
+        if self._index is not None and index == self._index + 1:
+            self._slabs[0,:] = self._slabs[1,:]
+        else:
+            self._slabs[0,:] = self.records[index,:]
+        if len(self.times) > 1:
+            self._slabs[1,:] = self.records[index + 1,:]
+            np.subtract(self._slabs[1,:],self._slabs[0,:],
+                        out=self._difference)
+        self._index = index
+
+    def __call__(self,state):
+        wind = state.aux[wind_index,:]
+        if wind.shape[0] != self.num_cells:
+            raise ValueError("Wind records have %s cells but the grid has %s."
+                                            % (self.num_cells,wind.shape[0]))
+        
+        # Find the bracketing records and interpolation weight
+        index = np.searchsorted(self.times,state.t,side='right') - 1
+        index = min(max(index,0),max(len(self.times) - 2,0))
+        self._load(index)
+        if len(self.times) > 1:
+            weight = ((state.t - self.times[index]) 
+                            / (self.times[index + 1] - self.times[index]))
+            weight = min(max(weight,0.0),1.0)
+        else:
+            weight = 0.0
+
+        np.multiply(self._difference,weight,out=wind)
+        np.add(wind,self._slabs[0,:],out=wind)
+
+
 # ========================
 # = Bathymetry functions =
 # ========================
+class BathymetryProfile(object):
+    r"""Piecewise-linear bathymetry profile in x
+
+    The profile is defined by a list of *(x,z)* points with non-decreasing x 
+    and is evaluated with a single call to `numpy.interp`.  Repeating an x 
+    value gives a jump in the bathymetry, at the jump the value to the right
+    is used.  Outside of the points the end values are continued.  The same
+    profile can be used to set the bathymetry in a 1D aux array and to create
+    2D topography grids.
+
+    :Input:
+     - *points* (list) - List of *(x,z)* pairs.
+    """
+
+    def __init__(self,points):
+        points = np.asarray(points,dtype=float)
+        if points.ndim != 2 or points.shape[1] != 2:
+            raise ValueError("Profile points must be a list of (x,z) pairs.")
+        self.x = points[:,0].copy()
+        self.z = points[:,1].copy()
+        if np.any(np.diff(self.x) < 0.0):
+            raise ValueError("Profile x values must be non-decreasing.")
+
+    def __call__(self,x):
+        r"""Evaluate the profile at *x*, which can have any shape"""
+        return np.interp(x,self.x,self.z)
+
+    def set_bathymetry(self,state):
+        r"""Set aux[bathy_index] of *state* to the profile
+        
+        This works for 1 and 2 dimensions assuming that the x-dimension is the
+        first available in the grid object.
+        """
+        z = self(state.grid.dimensions[0].centers)
+        z.shape = z.shape + (1,) * (state.aux.ndim - 2)
+        state.aux[bathy_index,...] = z
+
+    def topo_grid(self,x,y):
+        r"""Return the profile on the grid *x* by *y* indexed as [y,x]"""
+        Z = np.empty((len(y),len(x)))
+        Z[...] = self(x)
+        return Z
+
+    def topo_func(self,x,y):
+        r"""Topography function suitable for `topotools.Topography.topo_func`
+        """
+        return self(x)
+
+
+class TopoGrid(object):
+    r"""Topography read from a GeoClaw topo file for sampling transects
+
+    Topography files of type 2 and 3 (a six line header of ncols, nrows, 
+    xlower, ylower, cellsize and nodata_value followed by the values starting
+    from the northern most row) are supported.  The file is only parsed the
+    first time it is read, the grid is then cached next to it as a `.npy`
+    file which is used as long as it is newer than the topo file.  Missing 
+    values are stored as NaN.
+
+    :Input:
+     - *path* (string) - Path to the topo file.
+     - *cache* (bool) - Whether to read and write the `.npy` cache, default 
+       is True.
+    """
+
+    header_fields = ['ncols','nrows','xlower','ylower','cellsize',
+                     'nodata_value']
+
+    def __init__(self,path,cache=True):
+        self.path = path
+        header = self.read_header(path)
+        num_cols = int(header['ncols'])
+        num_rows = int(header['nrows'])
+        self.dx = header['cellsize']
+        self.x = header['xlower'] + self.dx * np.arange(num_cols)
+        self.y = header['ylower'] + self.dx * np.arange(num_rows)
+
+        cache_path = path + '.npy'
+        if (cache and os.path.exists(cache_path) and
+                    os.path.getmtime(cache_path) >= os.path.getmtime(path)):
+            self.Z = np.load(cache_path)
+        else:
+            Z = np.loadtxt(path,skiprows=len(self.header_fields))
+            Z = Z.reshape((num_rows,num_cols))[::-1,:]
+            self.Z = np.where(Z == header['nodata_value'],np.nan,Z)
+            if cache:
+                np.save(cache_path,self.Z)
+        if self.Z.shape != (num_rows,num_cols):
+            raise ValueError("Topography in %s has shape %s, expected %s." 
+                                % (path,self.Z.shape,(num_rows,num_cols)))
+
+    @classmethod
+    def read_header(cls,path):
+        r"""Return a dictionary of the header values of the topo file *path*
+        """
+        header = {}
+        with open(path,'r') as topo_file:
+            for field in cls.header_fields:
+                tokens = topo_file.readline().split()
+                if len(tokens) < 2:
+                    raise ValueError("Could not read %s from the header of "
+                                     "%s, only topo types 2 and 3 are "
+                                     "supported." % (field,path))
+                # The value may come before or after the field name
+                try:
+                    header[field] = float(tokens[0])
+                except ValueError:
+                    header[field] = float(tokens[1])
+        return header
+
+    def sample(self,x,y):
+        r"""Bilinearly interpolate the topography at the points *(x,y)*"""
+        x = np.asarray(x,dtype=float)
+        y = np.asarray(y,dtype=float)
+        if (np.any(x < self.x[0]) or np.any(x > self.x[-1]) or 
+            np.any(y < self.y[0]) or np.any(y > self.y[-1])):
+            raise ValueError("Sample points lie outside of the topography in "
+                             "%s." % self.path)
+
+        # Lower left grid point of each sample point and weights
+        i = np.minimum(((x - self.x[0]) / self.dx).astype(int),
+                       len(self.x) - 2)
+        j = np.minimum(((y - self.y[0]) / self.dx).astype(int),
+                       len(self.y) - 2)
+        a = (x - self.x[i]) / self.dx
+        b = (y - self.y[j]) / self.dx
+
+        return ((1.0 - a) * (1.0 - b) * self.Z[j,i] 
+                    + a * (1.0 - b) * self.Z[j,i + 1]
+                    + (1.0 - a) * b * self.Z[j + 1,i]
+                    + a * b * self.Z[j + 1,i + 1])
+
+    def set_bathymetry(self,state,start,end):
+        r"""Set aux[bathy_index] of *state* to the transect from *start* to 
+        *end*
+        
+        The lower and upper edges of the 1D grid are mapped to the points 
+        *start* and *end*, given as *(x,y)*, and the topography is sampled at
+        each cell center.
+        """
+        dimension = state.grid.dimensions[0]
+        s = (dimension.centers - dimension.lower) / (dimension.upper 
+                                                        - dimension.lower)
+        x = start[0] + s * (end[0] - start[0])
+        y = start[1] + s * (end[1] - start[1])
+        state.aux[bathy_index,:] = self.sample(x,y)
+
+
 def set_jump_bathymetry(state,jump_location,depths):
     """
     Set bathymetry representing a jump from depths[0] to depths[1] at 
@@ -71,9 +396,9 @@ def set_jump_bathymetry(state,jump_location,depths):
     first available in the grid object.
     """
     
-    x = state.grid.dimensions[0].centers
-    state.aux[bathy_index,...] = (x < jump_location) * depths[0]  + \
-                               (x >= jump_location) * depths[1]
+    profile = BathymetryProfile([(jump_location,depths[0]),
+                                 (jump_location,depths[1])])
+    profile.set_bathymetry(state)
                                
 
 def set_sloped_shelf_bathymetry(state,x0,x1,basin_depth,shelf_depth):
@@ -90,12 +415,8 @@ def set_sloped_shelf_bathymetry(state,x0,x1,basin_depth,shelf_depth):
     first available in the grid object.
     """
     
-    x = state.grid.dimensions[0].centers
-    slope = (basin_depth - shelf_depth) / (x0 - x1) * (x - x0) + basin_depth
-    
-    state.aux[bathy_index,...] = (x < x0) * basin_depth
-    state.aux[bathy_index,...] += (x0 <= x) * (x < x1) * slope
-    state.aux[bathy_index,...] += (x1 <= x) * shelf_depth
+    profile = BathymetryProfile([(x0,basin_depth),(x1,shelf_depth)])
+    profile.set_bathymetry(state)
 
 def set_gaussian_bathymetry(state,depth,A,sigma,x0):
     r"""Set bathymetry to a gaussian sill"""
@@ -5,27 +5,176 @@ Module containing boundary condition routines for the multilayer
 shallow water equations.
 
 :Available Routines:
-    - Wall boundary conditions
+    - Wall boundary conditions in 1D
+    - Inflow boundary conditions from tabulated time series in 1D
+    - Wall boundary conditions in 2D
+
+The 1D wall boundary conditions use the compiled versions in
+:mod:`multilayer.kernels` if they are enabled.  Boundary condition functions
+are not passed the solver, so unlike the step callbacks this does not depend
+on the solver's kernel_language, only on :func:`multilayer.kernels.enabled`.
 """
 
+import numpy as np
+
+import kernels
+from layout import Layout
+
 # ==========================
 # = 1 Dimensional Routines =
 # ==========================
 def wall_qbc_lower(state,dim,t,qbc,num_ghost):
-    for i in xrange(num_ghost):
-        qbc[0,i] = qbc[0,num_ghost]
-        qbc[1,i] = -qbc[1,num_ghost]
-        qbc[2,i] = qbc[2,num_ghost]
-        qbc[3,i] = -qbc[3,num_ghost]
+    r"""Solid wall boundary condition at the lower boundary
+
+    The depths of every layer in the first interior cell are copied into all
+    of the ghost cells and the momenta are copied with their sign reversed.
+    Any number of layers and ghost cells is supported.
+    """
+    if kernels.enabled():
+        kernels.fortran.wall_qbc_kernel(dim.num_cells,num_ghost,qbc,0)
+        return
+    layout = Layout(state.problem_data['num_layers'])
+    depths = layout.depths(qbc)
+    momenta = layout.momenta(qbc)
+    interior = slice(num_ghost,num_ghost + 1)
+    depths[:,:num_ghost] = depths[:,interior]
+    momenta[:,:num_ghost] = -momenta[:,interior]
     
 def wall_qbc_upper(state,dim,t,qbc,num_ghost):
-    for i in xrange(num_ghost + dim.num_cells,
-                    2*num_ghost + dim.num_cells):
-        qbc[0,i] = qbc[0,num_ghost + dim.num_cells-1]
-        qbc[1,i] = -qbc[1,num_ghost + dim.num_cells-1]
-        qbc[2,i] = qbc[2,num_ghost + dim.num_cells-1]
-        qbc[3,i] = -qbc[3,num_ghost + dim.num_cells-1]
+    r"""Solid wall boundary condition at the upper boundary
+
+    The depths of every layer in the last interior cell are copied into all
+    of the ghost cells and the momenta are copied with their sign reversed.
+    Any number of layers and ghost cells is supported.
+    """
+    if kernels.enabled():
+        kernels.fortran.wall_qbc_kernel(dim.num_cells,num_ghost,qbc,1)
+        return
+    layout = Layout(state.problem_data['num_layers'])
+    depths = layout.depths(qbc)
+    momenta = layout.momenta(qbc)
+    last = num_ghost + dim.num_cells - 1
+    interior = slice(last,last + 1)
+    depths[:,last + 1:] = depths[:,interior]
+    momenta[:,last + 1:] = -momenta[:,interior]
+
+class TabulatedInflow(object):
+    r"""Inflow boundary condition set from a tabulated time series
+
+    The ghost cells are set to the q values interpolated linearly in time from
+    a table, for instance to impose an internal tide at the deep end of a 
+    shelf.  The bracketing table entries are found by binary search and cached
+    so that consecutive steps only check that the cached entries still 
+    bracket t.  Outside of the table times the first or last values are 
+    used.  Instances are used as the solver's user_bc_lower or user_bc_upper,
+    *boundary* sets which side's ghost cells are filled.
+
+    :Input:
+     - *times* (array) - Increasing times of the table entries.
+     - *values* (array) - Values of q, :math:`\rho_k h_k, \rho_k h_k u_k`
+       for each layer, at each time with shape (len(times),num_eqn).
+     - *boundary* (string) - Either 'lower' or 'upper', default is 'lower'.
+    """
+
+    def __init__(self,times,values,boundary='lower'):
+        self.times = np.asarray(times,dtype=float)
+        self.values = np.asarray(values,dtype=float)
+        if self.values.ndim != 2 or self.values.shape[0] != len(self.times):
+            raise ValueError("Need one row of q values for each of the %s "
+                             "table times." % len(self.times))
+        if np.any(np.diff(self.times) <= 0.0):
+            raise ValueError("Table times must be increasing.")
+        if boundary not in ['lower','upper']:
+            raise ValueError("Boundary must be 'lower' or 'upper'.")
+        self.boundary = boundary
+        self._index = 0
+
+    @classmethod
+    def from_file(cls,path,boundary='lower'):
+        r"""Read the table from the text file *path*
+
+        Each row holds a time followed by the q values at that time.
+        """
+        table = np.loadtxt(path,ndmin=2)
+        return cls(table[:,0],table[:,1:],boundary=boundary)
+
+    def bracket(self,t):
+        r"""Return the index of the table entry at or before *t*"""
+        index = self._index
+        times = self.times
+        if not (times[index] <= t and 
+                (index + 1 == len(times) or t < times[index + 1])):
+            index = max(np.searchsorted(times,t,side='right') - 1,0)
+            self._index = index
+        return index
+
+    def __call__(self,state,dim,t,qbc,num_ghost):
+        index = self.bracket(t)
+        if index + 1 == len(self.times) or t <= self.times[0]:
+            q = self.values[index]
+        else:
+            weight = ((t - self.times[index]) 
+                            / (self.times[index + 1] - self.times[index]))
+            q = ((1.0 - weight) * self.values[index] 
+                                        + weight * self.values[index + 1])
+
+        if self.boundary == 'lower':
+            qbc[:,:num_ghost] = q.reshape((-1,1))
+        else:
+            qbc[:,num_ghost + dim.num_cells:] = q.reshape((-1,1))
 
 # ==========================
 # = 2 Dimensional Routines =
 # ==========================
+# In 2D q holds the depth, x-momentum and y-momentum of each layer, see
+# multilayer.layout, the ghost cells are set to the mirror image of the
+# interior with the momentum normal to the wall reversed.
+def _wall_qbc_2d(qbc,num_ghost,num_cells,axis,upper):
+    ghost = [slice(None)] * 3
+    interior = [slice(None)] * 3
+    if upper:
+        edge = num_ghost + num_cells
+        ghost[axis] = slice(edge,edge + num_ghost)
+        interior[axis] = slice(edge - 1,edge - num_ghost - 1,-1)
+    else:
+        ghost[axis] = slice(0,num_ghost)
+        interior[axis] = slice(2 * num_ghost - 1,num_ghost - 1,-1)
+    qbc[tuple(ghost)] = qbc[tuple(interior)]
+
+    # Reverse the momentum normal to the wall in every layer
+    layout = Layout(qbc.shape[0] // 3,num_dim=2)
+    momenta = layout.momenta(qbc,direction=axis - 1)[tuple(ghost)]
+    np.negative(momenta,out=momenta)
+
+def wall_qbc_lower_x(state,dim,t,qbc,num_ghost):
+    r"""Solid wall boundary condition at the lower x boundary in 2D"""
+    _wall_qbc_2d(qbc,num_ghost,dim.num_cells,1,False)
+
+def wall_qbc_upper_x(state,dim,t,qbc,num_ghost):
+    r"""Solid wall boundary condition at the upper x boundary in 2D"""
+    _wall_qbc_2d(qbc,num_ghost,dim.num_cells,1,True)
+
+def wall_qbc_lower_y(state,dim,t,qbc,num_ghost):
+    r"""Solid wall boundary condition at the lower y boundary in 2D"""
+    _wall_qbc_2d(qbc,num_ghost,dim.num_cells,2,False)
+
+def wall_qbc_upper_y(state,dim,t,qbc,num_ghost):
+    r"""Solid wall boundary condition at the upper y boundary in 2D"""
+    _wall_qbc_2d(qbc,num_ghost,dim.num_cells,2,True)
+
+def wall_qbc_lower_2d(state,dim,t,qbc,num_ghost):
+    r"""Solid wall boundary condition at the lower boundary of *dim* in 2D
+
+    PyClaw uses a single user boundary condition function for all dimensions,
+    this dispatches to the x or y version depending on *dim*.
+    """
+    axis = 1 + state.grid.dimensions.index(dim)
+    _wall_qbc_2d(qbc,num_ghost,dim.num_cells,axis,False)
+
+def wall_qbc_upper_2d(state,dim,t,qbc,num_ghost):
+    r"""Solid wall boundary condition at the upper boundary of *dim* in 2D
+
+    See :func:`wall_qbc_lower_2d`.
+    """
+    axis = 1 + state.grid.dimensions.index(dim)
+    _wall_qbc_2d(qbc,num_ghost,dim.num_cells,axis,True)
@@ -0,0 +1,219 @@
+# encoding: utf-8
+r"""
+Module containing low-overhead diagnostic records kept during a run.
+
+:Available Classes:
+    - HyperbolicityLog - Bounded record of cells where kappa exceeded the
+      Richardson tolerance
+    - ClippingLog - Mass and momentum changed by clipping negative depths
+"""
+
+import json
+import logging
+
+import numpy as np
+
+logger = logging.getLogger('multilayer')
+
+class HyperbolicityLog(object):
+    r"""Bounded ring buffer of hyperbolicity violation events
+
+    Each event records the time, step number, cell index, interface and value
+    of kappa at a cell where the Richardson tolerance was exceeded.  Only the
+    most recent *capacity* events are kept, older events are overwritten but
+    are still counted in the summary.
+
+    :Input:
+     - *capacity* (int) - Maximum number of events stored, default is 10000.
+     - *summary_interval* (int) - A one line summary is written to the
+       'multilayer' logger every *summary_interval* steps if new events have
+       been recorded since the last summary.  None turns the summary off.
+       Default is 100.
+    """
+
+    dtype = np.dtype([('t','f8'),('step','i8'),('index','i8'),
+                      ('interface','i8'),('kappa','f8')])
+
+    def __init__(self,capacity=10000,summary_interval=100):
+        self.capacity = capacity
+        self.summary_interval = summary_interval
+        self.events = np.zeros(capacity,dtype=self.dtype)
+        self.num_events = 0
+        self.num_steps = 0
+        self.max_kappa = 0.0
+        self._last_summary_step = 0
+        self._last_summary_events = 0
+
+    def __len__(self):
+        return min(self.num_events,self.capacity)
+
+    @property
+    def num_dropped(self):
+        r"""Number of events that have been overwritten"""
+        return self.num_events - len(self)
+
+    def record(self,t,step,indices,kappa,interfaces=0):
+        r"""Record the violations at cells *indices* with values *kappa*
+        
+        *interfaces* gives the internal interface of each violation and can
+        be a scalar if they are all on the same interface.
+        """
+
+        num_new = len(indices)
+        if num_new == 0:
+            return
+        self.num_steps += 1
+        self.max_kappa = max(self.max_kappa,np.max(kappa))
+
+        # Only the last capacity events can be kept
+        if num_new > self.capacity:
+            indices = indices[-self.capacity:]
+            kappa = kappa[-self.capacity:]
+            if not np.isscalar(interfaces):
+                interfaces = interfaces[-self.capacity:]
+            start = (self.num_events + num_new - self.capacity) % self.capacity
+        else:
+            start = self.num_events % self.capacity
+        slots = (start + np.arange(len(indices))) % self.capacity
+
+        self.events['t'][slots] = t
+        self.events['step'][slots] = step
+        self.events['index'][slots] = indices
+        self.events['interface'][slots] = interfaces
+        self.events['kappa'][slots] = kappa
+        self.num_events += num_new
+
+    def to_array(self):
+        r"""Return a copy of the stored events in the order they occurred"""
+        if self.num_events <= self.capacity:
+            return self.events[:self.num_events].copy()
+        start = self.num_events % self.capacity
+        return np.concatenate((self.events[start:],self.events[:start]))
+
+    def summary(self):
+        r"""Return a dictionary summarizing the recorded violations"""
+        events = self.to_array()
+        summary = {"num_events":self.num_events,
+                   "num_dropped":self.num_dropped,
+                   "num_steps":self.num_steps,
+                   "max_kappa":float(self.max_kappa)}
+        if len(events) > 0:
+            summary["first_t"] = float(events['t'][0])
+            summary["last_t"] = float(events['t'][-1])
+        return summary
+
+    def summarize(self,step):
+        r"""Write a summary to the logger if one is due at *step*
+
+        This is cheap to call every step.
+        """
+        if self.summary_interval is None:
+            return
+        if step - self._last_summary_step >= self.summary_interval:
+            self._last_summary_step = step
+            if self.num_events > self._last_summary_events:
+                logger.info("Hyperbolicity may have failed: %s new events "
+                            "by step %s, max kappa = %s"
+                                % (self.num_events - self._last_summary_events,
+                                   step,self.max_kappa))
+                self._last_summary_events = self.num_events
+
+    def save(self,path):
+        r"""Save the log to *path*
+
+        If *path* ends in '.json' the summary and events are written as JSON
+        with one list per field, otherwise the events are saved as a NumPy
+        record array with `numpy.save`.
+        """
+        if path.endswith('.json'):
+            events = self.to_array()
+            record = self.summary()
+            record['events'] = dict((name,events[name].tolist())
+                                                for name in self.dtype.names)
+            with open(path,'w') as out_file:
+                json.dump(record,out_file)
+        else:
+            np.save(path,self.to_array())
+
+
+class ClippingLog(object):
+    r"""Accumulator of the mass and momentum changed by clipping negative depths
+
+    For each step where :func:`multilayer.step.before_step` clipped negative
+    depths a record of the time, step and, for each layer, the mass added and
+    the momentum removed by the clipping is buffered.  Mass here is the 
+    integral of q over the grid, i.e. it includes the layer density.  The
+    buffer is preallocated and is flushed when full and whenever
+    :meth:`flush` is called, see :meth:`attach` to flush at every output time.
+
+    :Input:
+     - *num_layers* (int) - Number of layers.
+     - *capacity* (int) - Number of records buffered between flushes.
+     - *path* (string) - If given flushed records are appended to this file as
+       raw float64 values, otherwise they are kept in memory.
+    """
+
+    def __init__(self,num_layers,capacity=1000,path=None):
+        self.num_layers = num_layers
+        self.capacity = capacity
+        self.path = path
+        self.buffer = np.zeros((capacity,2 + 2 * num_layers))
+        self.num_buffered = 0
+        self.total_mass = np.zeros(num_layers)
+        self.total_momentum = np.zeros(num_layers)
+        self._flushed = []
+        if path is not None:
+            open(path,'wb').close()
+
+    @property
+    def columns(self):
+        r"""Names of the columns of each record"""
+        return (['t','step'] 
+                    + ['mass_%s' % layer for layer in xrange(self.num_layers)]
+                    + ['momentum_%s' % layer 
+                                        for layer in xrange(self.num_layers)])
+
+    def record(self,t,step,mass,momentum):
+        r"""Record the *mass* added and *momentum* removed in each layer"""
+        if self.num_buffered == self.capacity:
+            self.flush()
+        row = self.buffer[self.num_buffered]
+        row[0] = t
+        row[1] = step
+        row[2:2 + self.num_layers] = mass
+        row[2 + self.num_layers:] = momentum
+        self.num_buffered += 1
+        self.total_mass += mass
+        self.total_momentum += momentum
+
+    def flush(self):
+        r"""Move the buffered records to the file or in-memory store"""
+        if self.num_buffered == 0:
+            return
+        if self.path is not None:
+            with open(self.path,'ab') as out_file:
+                self.buffer[:self.num_buffered].tofile(out_file)
+        else:
+            self._flushed.append(self.buffer[:self.num_buffered].copy())
+        self.num_buffered = 0
+
+    def attach(self,controller):
+        r"""Flush the log every time *controller* writes an output frame"""
+        write = controller.solution.write
+        def write_and_flush(*args,**kargs):
+            self.flush()
+            return write(*args,**kargs)
+        controller.solution.write = write_and_flush
+
+    def to_array(self):
+        r"""Return all records, one per row, see :attr:`columns`"""
+        self.flush()
+        if self.path is not None:
+            return np.fromfile(self.path).reshape((-1,self.buffer.shape[1]))
+        if len(self._flushed) == 0:
+            return np.zeros((0,self.buffer.shape[1]))
+        return np.concatenate(self._flushed)
+
+    def save(self,path):
+        r"""Save all records to *path* as text with a header of the columns"""
+        np.savetxt(path,self.to_array(),header=" ".join(self.columns))
@@ -0,0 +1,164 @@
+# encoding: utf-8
+r"""
+Eigenvalues and eigenvectors of the two-layer shallow water equations.
+
+All routines work on whole arrays of states at once.  The waves are numbered
+by family from 1 to 4 in order of increasing speed, 1 and 4 are the external
+(surface) waves and 2 and 3 the internal waves.  Eigenvectors are given in
+terms of :math:`(h_1, h_1 u_1, h_2, h_2 u_2)` and are stored with the
+component first and the family second, i.e. eig_vectors[:,k] is the
+eigenvector of family k + 1.
+
+:Available Routines:
+    - linearized_alpha - Ratio of the internal to top layer perturbations
+    - linearized_eigen - Closed form eigenstructure about a state at rest
+    - wave_family_eigenvector - Closed form eigenvalue and alpha of a family
+    - jacobian - Flux Jacobian of the two-layer equations
+    - exact_eigen - Eigenstructure of the flux Jacobian
+    - LinearizedEigenCache - Cache of the closed form eigenstructure
+"""
+
+import numpy as np
+
+# ================================================
+# = Closed form linearized about a state at rest =
+# ================================================
+def linearized_alpha(h_1,h_2,r):
+    r"""Return alpha of the external and of the internal waves
+
+    With :math:`\gamma = h_2 / h_1` these are
+
+    .. math::
+        \alpha_\pm = \frac{1}{2} \left(\gamma - 1 \pm \sqrt{(\gamma - 1)^2
+                            + 4 r \gamma} \right)
+
+    with the + root giving the external and the - root the internal waves.
+    """
+    gamma = h_2 / h_1
+    root = np.sqrt((gamma - 1.0)**2 + 4.0 * r * gamma)
+    return 0.5 * (gamma - 1.0 + root),0.5 * (gamma - 1.0 - root)
+
+
+def wave_family_eigenvector(h_1,h_2,r,g,wave_family):
+    r"""Linearized eigenvalue and eigenvector of a two-layer wave family
+
+    For the quiescent depths *h_1* and *h_2*, which may be arrays, returns the
+    eigenvalue :math:`\lambda = \pm \sqrt{g h_1 (1 + \alpha)}` and
+    :math:`\alpha` where the eigenvector is
+    :math:`(1, \lambda, \alpha, \lambda \alpha)`.
+    """
+    if wave_family not in [1,2,3,4]:
+        raise Exception("Unsupported wave family %s requested!" % wave_family)
+    alpha_external,alpha_internal = linearized_alpha(h_1,h_2,r)
+    if wave_family in [1,4]:
+        alpha = alpha_external
+    else:
+        alpha = alpha_internal
+
+    eig_value = np.sqrt(g * h_1 * (1.0 + alpha))
+    if wave_family < 3:
+        eig_value = -eig_value
+    return eig_value,alpha
+
+
+def linearized_eigen(h_1,h_2,r,g):
+    r"""Closed form eigenvalues and eigenvectors about a state at rest
+
+    Returns the eigenvalues with shape (4,) + h_1.shape and the eigenvectors
+    with shape (4,4) + h_1.shape, see :func:`wave_family_eigenvector`.  The
+    velocities are taken to be zero.
+    """
+    alpha_external,alpha_internal = linearized_alpha(h_1,h_2,r)
+    speed_external = np.sqrt(g * h_1 * (1.0 + alpha_external))
+    speed_internal = np.sqrt(g * h_1 * (1.0 + alpha_internal))
+
+    eig_values = np.array([-speed_external,-speed_internal,
+                           speed_internal,speed_external])
+    alpha = np.array([alpha_external,alpha_internal,
+                      alpha_internal,alpha_external])
+    eig_vectors = np.empty((4,) + eig_values.shape)
+    eig_vectors[0,...] = 1.0
+    eig_vectors[1,...] = eig_values
+    eig_vectors[2,...] = alpha
+    eig_vectors[3,...] = eig_values * alpha
+    return eig_values,eig_vectors
+
+
+class LinearizedEigenCache(object):
+    r"""Cache of :func:`linearized_eigen` for the quiescent state h_hat
+
+    The quiescent state does not change during a run so the eigenstructure
+    is only recomputed when h_hat, r or g differ from the previous call.
+    """
+
+    def __init__(self):
+        self._key = None
+        self._h_hat = None
+        self._result = None
+
+    def __call__(self,h_hat,r,g):
+        r"""Return :func:`linearized_eigen` of the depths in *h_hat*
+
+        *h_hat* holds the depth of each layer in its first dimension, for
+        instance aux[h_hat_slice(2),:].
+        """
+        if (self._key != (r,g) or self._h_hat is None or
+                                    not np.array_equal(self._h_hat,h_hat)):
+            self._key = (r,g)
+            self._h_hat = np.array(h_hat,copy=True)
+            self._result = linearized_eigen(self._h_hat[0],self._h_hat[1],r,g)
+        return self._result
+
+
+# =======================================
+# = Eigenstructure of the flux Jacobian =
+# =======================================
+def jacobian(h_1,h_2,u_1,u_2,r,g):
+    r"""Flux Jacobian including the non-conservative coupling terms
+
+    Returns an array of shape h_1.shape + (4,4) in terms of
+    :math:`(h_1, h_1 u_1, h_2, h_2 u_2)`.
+    """
+    h_1 = np.asarray(h_1,dtype=float)
+    A = np.zeros(h_1.shape + (4,4))
+    A[...,0,1] = 1.0
+    A[...,1,0] = g * h_1 - u_1**2
+    A[...,1,1] = 2.0 * u_1
+    A[...,1,2] = g * h_1
+    A[...,2,3] = 1.0
+    A[...,3,0] = r * g * h_2
+    A[...,3,2] = g * h_2 - u_2**2
+    A[...,3,3] = 2.0 * u_2
+    return A
+
+
+def exact_eigen(h_1,h_2,u_1,u_2,r,g):
+    r"""Eigenvalues and eigenvectors of the flux Jacobian
+
+    All of the Jacobians are decomposed in one batched call to
+    `numpy.linalg.eig`.  The eigenvalues are sorted by their real part so
+    that they are ordered by family and the eigenvectors are scaled so that
+    their first component is one where it is not zero.  If hyperbolicity has
+    been lost the eigenvalues of the internal waves are complex and complex
+    arrays are returned.  The shapes are as in :func:`linearized_eigen`.
+    """
+    A = jacobian(h_1,h_2,u_1,u_2,r,g)
+    shape = A.shape[:-2]
+    A = A.reshape((-1,4,4))
+    eig_values,eig_vectors = np.linalg.eig(A)
+
+    # Sort by family
+    order = np.argsort(eig_values.real,axis=-1)
+    points = np.arange(A.shape[0]).reshape((-1,1))
+    eig_values = eig_values[points,order]
+    components = np.arange(4).reshape((1,4,1))
+    eig_vectors = eig_vectors[points[...,np.newaxis],components,
+                              order[:,np.newaxis,:]]
+
+    scale = eig_vectors[:,0:1,:]
+    scale = np.where(np.abs(scale) > 0.0,scale,1.0)
+    eig_vectors = eig_vectors / scale
+
+    eig_values = eig_values.transpose().reshape((4,) + shape)
+    eig_vectors = eig_vectors.transpose((1,2,0)).reshape((4,4) + shape)
+    return eig_values,eig_vectors
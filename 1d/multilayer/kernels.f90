@@ -0,0 +1,179 @@
+! ============================================================================
+!  Compiled versions of the per-step multilayer callbacks
+!
+!  These are built into the Python extension _kernels with f2py, see the
+!  Makefile in this directory and multilayer/kernels.py.
+! ============================================================================
+
+! ============================================================================
+!  before_step_kernel
+!
+!  Fused version of the diagnostics done in multilayer.step.before_step.  For
+!  each cell negative layer depths and their momenta are zeroed, the layer
+!  velocities are computed where the layer is wet and kappa for each internal
+!  interface is stored in aux(kappa_index:kappa_index + num_layers - 2,:).
+!  Returns the number of interface values where kappa exceeds the Richardson
+!  tolerance and the lower layer is wet along with the mass added and momentum
+!  removed in each layer by the clipping.  If compute_kappa is 0 only the
+!  clipping is done and kappa is left untouched.
+! ============================================================================
+subroutine before_step_kernel(num_eqn, num_aux, num_cells, num_layers, q,   &
+                              aux, rho, g_prime, dry_tolerance,             &
+                              richardson_tolerance, kappa_index,            &
+                              compute_kappa, num_exceeded, clipped_mass,    &
+                              clipped_momentum)
+
+    implicit none
+
+    ! Input
+    integer, intent(in) :: num_eqn, num_aux, num_cells, num_layers
+    integer, intent(in) :: kappa_index, compute_kappa
+    real(kind=8), intent(inout) :: q(num_eqn, num_cells)
+    real(kind=8), intent(inout) :: aux(num_aux, num_cells)
+    real(kind=8), intent(in) :: rho(num_layers), g_prime(num_layers - 1)
+    real(kind=8), intent(in) :: dry_tolerance, richardson_tolerance
+
+    ! Output
+    integer, intent(out) :: num_exceeded
+    real(kind=8), intent(out) :: clipped_mass(num_layers)
+    real(kind=8), intent(out) :: clipped_momentum(num_layers)
+
+    ! Locals
+    integer :: i, layer, m
+    real(kind=8) :: h(num_layers), u(num_layers), kappa
+
+    num_exceeded = 0
+    clipped_mass = 0.d0
+    clipped_momentum = 0.d0
+    if (compute_kappa == 0) then
+        do i = 1, num_cells
+            do m = 1, 2 * num_layers - 1, 2
+                if (q(m, i) < 0.d0) then
+                    layer = (m + 1) / 2
+                    clipped_mass(layer) = clipped_mass(layer) - q(m, i)
+                    clipped_momentum(layer) = clipped_momentum(layer)         &
+                                                + q(m + 1, i)
+                    q(m, i) = 0.d0
+                    q(m + 1, i) = 0.d0
+                end if
+            end do
+        end do
+        return
+    end if
+
+    do i = 1, num_cells
+        do layer = 1, num_layers
+            m = 2 * layer - 1
+
+            ! Zero out negative values
+            if (q(m, i) < 0.d0) then
+                clipped_mass(layer) = clipped_mass(layer) - q(m, i)
+                clipped_momentum(layer) = clipped_momentum(layer) + q(m + 1, i)
+                q(m, i) = 0.d0
+                q(m + 1, i) = 0.d0
+            end if
+
+            ! Depth and velocity
+            h(layer) = q(m, i) / rho(layer)
+            if (h(layer) > dry_tolerance) then
+                u(layer) = q(m + 1, i) / q(m, i)
+            else
+                u(layer) = 0.d0
+            end if
+        end do
+
+        ! Calculate kappa and check against the Richardson tolerance
+        do layer = 1, num_layers - 1
+            kappa = (u(layer) - u(layer + 1))**2                             &
+                        / (g_prime(layer) * (h(layer) + h(layer + 1)))
+            aux(kappa_index + layer - 1, i) = kappa
+            if (kappa > richardson_tolerance .and.                           &
+                h(layer + 1) > dry_tolerance) then
+                num_exceeded = num_exceeded + 1
+            end if
+        end do
+    end do
+
+end subroutine before_step_kernel
+
+! ============================================================================
+!  friction_kernel
+!
+!  Manning's-N friction source term done in multilayer.step.friction_source
+!  for the classic solver.  The momentum of the bottom layer is damped where
+!  it is wet and the momentum of the top layer where the bottom layer is dry.
+!  The expressions match the NumPy version so that the results are identical.
+!
+!  Note that two quirks of the legacy loop are kept on purpose for parity with
+!  multilayer.step.friction_damping and must not be fixed here alone:
+!   - h**(4/3) is integer division, the exponent is 1 and not 4/3.
+!   - In the wet branch u = q(3,i) / rho(2), i.e. u is the depth h and not
+!     the velocity q(4,i) / q(3,i).
+! ============================================================================
+subroutine friction_kernel(num_eqn, num_cells, q, rho, g, manning, dt,        &
+                           dry_tolerance)
+
+    implicit none
+
+    ! Input
+    integer, intent(in) :: num_eqn, num_cells
+    real(kind=8), intent(inout) :: q(num_eqn, num_cells)
+    real(kind=8), intent(in) :: rho(2), g, manning, dt, dry_tolerance
+
+    ! Locals
+    integer :: i
+    real(kind=8) :: h, u, gamma
+
+    do i = 1, num_cells
+        h = q(3, i) / rho(2)
+        if (h < dry_tolerance) then
+            h = q(1, i) / rho(1)
+            u = q(2, i) / rho(1)
+            ! Deliberately h**1 as 4/3 is integer division, see above
+            gamma = u * g * manning**2 / h**(4/3)
+            q(2, i) = q(2, i) / (1.d0 + dt * gamma) * rho(1)
+        else
+            ! Deliberately h and not the velocity and h**1, see above
+            u = q(3, i) / rho(2)
+            gamma = u * g * manning**2 / h**(4/3)
+            q(4, i) = q(4, i) / (1.d0 + dt * gamma) * rho(2)
+        end if
+    end do
+
+end subroutine friction_kernel
+
+! ============================================================================
+!  wall_qbc_kernel
+!
+!  Solid wall boundary conditions for any number of layers.  The depths in the
+!  first (or last) interior cell are copied into all of the ghost cells and
+!  the momenta are copied with their sign reversed.  If upper is 0 the lower
+!  boundary is set, otherwise the upper boundary.
+! ============================================================================
+subroutine wall_qbc_kernel(num_eqn, num_cells, num_ghost, qbc, upper)
+
+    implicit none
+
+    ! Input
+    integer, intent(in) :: num_eqn, num_cells, num_ghost, upper
+    real(kind=8), intent(inout) :: qbc(num_eqn, num_cells + 2 * num_ghost)
+
+    ! Locals
+    integer :: i, interior, first, m
+
+    if (upper == 0) then
+        interior = num_ghost + 1
+        first = 1
+    else
+        interior = num_ghost + num_cells
+        first = num_ghost + num_cells + 1
+    end if
+
+    do i = first, first + num_ghost - 1
+        do m = 1, num_eqn - 1, 2
+            qbc(m, i) = qbc(m, interior)
+            qbc(m + 1, i) = -qbc(m + 1, interior)
+        end do
+    end do
+
+end subroutine wall_qbc_kernel
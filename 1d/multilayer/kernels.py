@@ -0,0 +1,49 @@
+# encoding: utf-8
+r"""
+Optional compiled kernels for the multilayer callbacks.
+
+The Fortran source is in kernels.f90 and is built into the extension module
+`_kernels` with f2py by running `make` in this directory.  Compiled versions
+of :func:`multilayer.step.before_step`, :func:`multilayer.step.friction_source`
+and the wall boundary conditions in :mod:`multilayer.bc` are provided.  If the
+extension has not been built, or has been switched off with
+:func:`set_enabled`, the callbacks fall back to their NumPy implementations.
+
+The step callbacks also require the solver's kernel_language to be 'Fortran',
+see :func:`use_compiled`.  The boundary condition functions are not passed the
+solver so they only check :func:`enabled`.
+
+:Attributes:
+ - *fortran* (module) - The compiled extension or None if it is not available.
+"""
+
+try:
+    import _kernels as fortran
+except ImportError:
+    fortran = None
+
+_enabled = True
+
+def available():
+    r"""Return True if the compiled kernels have been built"""
+    return fortran is not None
+
+def set_enabled(flag):
+    r"""Turn the use of the compiled kernels on or off at runtime
+    
+    Turning them on has no effect if the extension has not been built.
+    """
+    global _enabled
+    _enabled = bool(flag)
+
+def enabled():
+    r"""Return True if the compiled kernels are built and switched on"""
+    return _enabled and fortran is not None
+
+def use_compiled(solver):
+    r"""Return True if the callbacks of *solver* should use the kernels
+    
+    The kernels are used if they are enabled and the solver's kernel_language
+    is 'Fortran'.
+    """
+    return enabled() and solver.kernel_language == 'Fortran'
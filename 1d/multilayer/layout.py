@@ -0,0 +1,152 @@
+# encoding: utf-8
+r"""
+Module describing where the fields of each layer are stored in q and aux.
+
+A :class:`Layout` is built from the number of layers and the dimension and
+returns views into the q and aux arrays of a state, so that fields can be
+addressed by name and layer without hard coding indices or copying.  All of
+the accessors accept either a state or the q (or aux) array itself, e.g. the
+`cd.q` array available in setplot functions.  For example::
+
+    layout = Layout(num_layers=2)
+    h_bottom = layout.h(state,1) / rho[1]
+    layout.momenta(state)[...] = 0.0
+
+The layouts are
+
+ - *1D PyClaw* - q holds :math:`\rho_k h_k, \rho_k h_k u_k` for each layer
+   and aux holds the bathymetry, wind, h_hat for each layer and kappa for
+   each internal interface, see :mod:`multilayer.aux`.
+ - *2D GeoClaw* - q holds :math:`\rho_k h_k, \rho_k h_k u_k, \rho_k h_k v_k`
+   for each layer and h_hat for each layer starts at aux_layer_index.  Kappa
+   is not stored in aux.
+"""
+
+import aux
+
+class Layout(object):
+    r"""Layout of the q and aux arrays for a number of layers and dimension
+
+    :Input:
+     - *num_layers* (int) - Number of layers, default is 2.
+     - *num_dim* (int) - Number of dimensions, 1 (PyClaw) or 2 (GeoClaw).
+       Default is 1.
+     - *aux_layer_index* (int) - 0-based index of the first h_hat field in
+       2D, default is 4.
+    """
+
+    def __init__(self,num_layers=2,num_dim=1,aux_layer_index=4):
+        if num_dim not in [1,2]:
+            raise ValueError("Only 1 and 2 dimensions are supported.")
+        self.num_layers = num_layers
+        self.num_dim = num_dim
+        self.eqn_per_layer = num_dim + 1
+
+        self.bathy_index = aux.bathy_index
+        if num_dim == 1:
+            self.wind_index = aux.wind_index
+            self.h_hat_slice = aux.h_hat_slice(num_layers)
+            self.kappa_slice = aux.kappa_slice(num_layers)
+            self.num_aux = aux.num_aux(num_layers)
+        else:
+            self.wind_index = None
+            self.h_hat_slice = slice(aux_layer_index,
+                                     aux_layer_index + num_layers)
+            self.kappa_slice = None
+            self.num_aux = aux_layer_index + num_layers
+
+    @property
+    def num_eqn(self):
+        r"""Number of fields in q"""
+        return self.eqn_per_layer * self.num_layers
+
+    def _check_layer(self,layer):
+        if not 0 <= layer < self.num_layers:
+            raise IndexError("Layer %s out of range for %s layers."
+                                                    % (layer,self.num_layers))
+
+    # =====
+    # = q =
+    # =====
+    def h_index(self,layer):
+        r"""Index in q of :math:`\rho h` of *layer*"""
+        self._check_layer(layer)
+        return self.eqn_per_layer * layer
+
+    def hu_index(self,layer):
+        r"""Index in q of :math:`\rho h u` of *layer*"""
+        return self.h_index(layer) + 1
+
+    def hv_index(self,layer):
+        r"""Index in q of :math:`\rho h v` of *layer*, 2D only"""
+        if self.num_dim < 2:
+            raise ValueError("There is no y-momentum in 1D.")
+        return self.h_index(layer) + 2
+
+    def h(self,state,layer):
+        r"""View of :math:`\rho h` of *layer*"""
+        return _q(state)[self.h_index(layer),...]
+
+    def hu(self,state,layer):
+        r"""View of :math:`\rho h u` of *layer*"""
+        return _q(state)[self.hu_index(layer),...]
+
+    def hv(self,state,layer):
+        r"""View of :math:`\rho h v` of *layer*, 2D only"""
+        return _q(state)[self.hv_index(layer),...]
+
+    def depths(self,state):
+        r"""View of :math:`\rho h` of all layers, indexed by layer first"""
+        return _q(state)[0::self.eqn_per_layer,...]
+
+    def momenta(self,state,direction=0):
+        r"""View of the momentum in *direction* of all layers"""
+        if direction >= self.num_dim:
+            raise ValueError("No momentum in direction %s in %sD."
+                                                    % (direction,self.num_dim))
+        return _q(state)[1 + direction::self.eqn_per_layer,...]
+
+    # =======
+    # = aux =
+    # =======
+    def bathy(self,state):
+        r"""View of the bathymetry"""
+        return _aux(state)[self.bathy_index,...]
+
+    def wind(self,state):
+        r"""View of the wind field, 1D only"""
+        if self.wind_index is None:
+            raise ValueError("The wind is not stored in aux in %sD."
+                                                                % self.num_dim)
+        return _aux(state)[self.wind_index,...]
+
+    def h_hat(self,state,layer=None):
+        r"""View of h_hat of *layer* or of all layers if *layer* is None"""
+        h_hat = _aux(state)[self.h_hat_slice,...]
+        if layer is None:
+            return h_hat
+        self._check_layer(layer)
+        return h_hat[layer,...]
+
+    def kappa(self,state,interface=None):
+        r"""View of kappa at *interface* or at all interfaces if it is None
+
+        Interface k lies between layers k and k+1.  Only available in 1D.
+        """
+        if self.kappa_slice is None:
+            raise ValueError("Kappa is not stored in aux in %sD."
+                                                                % self.num_dim)
+        kappa = _aux(state)[self.kappa_slice,...]
+        if interface is None:
+            return kappa
+        if not 0 <= interface < self.num_layers - 1:
+            raise IndexError("Interface %s out of range for %s layers."
+                                                % (interface,self.num_layers))
+        return kappa[interface,...]
+
+
+def _q(state):
+    return getattr(state,'q',state)
+
+def _aux(state):
+    return getattr(state,'aux',state)
@@ -0,0 +1,117 @@
+# encoding: utf-8
+r"""
+Module containing output of the aux array split into static and dynamic parts.
+
+The bathymetry and h_hat do not change during a run so they only need to be
+written once.  :class:`SplitAuxOutput` has the controller write the full aux
+array with frame 0 only and saves just the time dependent fields, the wind
+and kappa by default, with every frame.  :func:`read_aux` and
+:func:`read_solution` recombine them so that a full aux array is available
+for every frame.  Output written without the split is read as before.
+
+A dynamic aux frame is stored as a `.npy` file in the output directory named
+`<prefix>.aux_dynamic.<frame>.npy`, and the aux indices stored in it are
+written once to `<prefix>.aux_dynamic.indices`.
+"""
+
+import os
+
+import numpy as np
+
+from clawpack.pyclaw.solution import Solution
+
+from layout import Layout
+
+def dynamic_aux_path(path,frame,file_prefix='fort'):
+    r"""Path of the dynamic aux file of *frame* in the directory *path*"""
+    return os.path.join(path,"%s.aux_dynamic.%04d.npy" % (file_prefix,frame))
+
+def dynamic_indices_path(path,file_prefix='fort'):
+    r"""Path of the file listing the dynamic aux indices in *path*"""
+    return os.path.join(path,"%s.aux_dynamic.indices" % file_prefix)
+
+
+class SplitAuxOutput(object):
+    r"""Write static aux fields once and dynamic aux fields every frame
+
+    :Input:
+     - *num_layers* (int) - Number of layers, used for the default dynamic
+       fields.
+     - *dynamic_indices* (list) - Aux indices written every frame.  Default
+       is the wind and kappa at each internal interface.
+    """
+
+    def __init__(self,num_layers=2,dynamic_indices=None):
+        if dynamic_indices is None:
+            layout = Layout(num_layers)
+            dynamic_indices = ([layout.wind_index]
+                                + range(layout.kappa_slice.start,
+                                        layout.kappa_slice.stop))
+        self.dynamic_indices = np.array(dynamic_indices,dtype=int)
+
+    def attach(self,controller):
+        r"""Set up *controller* to write the aux array split
+
+        The full aux array is written with the initial frame only and the
+        solution's write is wrapped to save the dynamic fields with each
+        frame.  This should be called after the solution has been attached to
+        the controller.
+        """
+        controller.write_aux_init = True
+        controller.write_aux_always = False
+        controller.write_aux = False
+
+        solution = controller.solution
+        write = solution.write
+        dynamic_indices = self.dynamic_indices
+        def write_and_save(frame,path='./',file_format='ascii',
+                           file_prefix=None,*args,**kargs):
+            result = write(frame,path,file_format,file_prefix,*args,**kargs)
+            # The controller passes a FrameCounter which only converts to str
+            frame = int(str(frame))
+            if file_prefix is None:
+                file_prefix = 'fort'
+            if frame == 0:
+                np.savetxt(dynamic_indices_path(path,file_prefix),
+                           dynamic_indices,fmt='%d')
+            np.save(dynamic_aux_path(path,frame,file_prefix),
+                    solution.state.aux[dynamic_indices,...])
+            return result
+        solution.write = write_and_save
+
+
+_static_aux = {}
+
+def read_aux(frame,path='./',file_format='ascii',file_prefix='fort'):
+    r"""Return the full aux array of *frame* in the output directory *path*
+
+    If the dynamic fields were saved separately the static fields are read
+    from frame 0, once per output directory, and the dynamic fields of
+    *frame* are put in their place.  Otherwise the aux array written with
+    *frame* is read.
+    """
+    indices_path = dynamic_indices_path(path,file_prefix)
+    if not os.path.exists(indices_path):
+        return Solution(frame,path=path,file_format=file_format,
+                        file_prefix=file_prefix,read_aux=True).state.aux
+
+    key = (os.path.abspath(path),file_prefix)
+    modified = os.path.getmtime(indices_path)
+    if key not in _static_aux or _static_aux[key][0] != modified:
+        aux = Solution(0,path=path,file_format=file_format,
+                       file_prefix=file_prefix,read_aux=True).state.aux
+        indices = np.atleast_1d(np.loadtxt(indices_path,dtype=int))
+        _static_aux[key] = (modified,aux,indices)
+    aux,indices = _static_aux[key][1:]
+
+    aux = aux.copy()
+    aux[indices,...] = np.load(dynamic_aux_path(path,frame,file_prefix))
+    return aux
+
+
+def read_solution(frame,path='./',file_format='ascii',file_prefix='fort'):
+    r"""Read the solution of *frame* with the full aux array recombined"""
+    solution = Solution(frame,path=path,file_format=file_format,
+                        file_prefix=file_prefix)
+    solution.state.aux = read_aux(frame,path,file_format,file_prefix)
+    return solution
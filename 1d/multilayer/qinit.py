@@ -8,16 +8,39 @@ import numpy as np
 
 # Get locations in the aux array of pertinent quantities
 from aux import kappa_index,h_hat_index
+from eigen import wave_family_eigenvector
+from output import SplitAuxOutput,read_solution
 
 def set_riemann_init_condition(state,jump_location,q_left,q_right):
-    r"""Set a Riemann type initial condition"""
+    r"""Set a Riemann type initial condition
+    
+    The state is *q_left* left of *jump_location* and *q_right* to the right,
+    see :func:`set_piecewise_init_condition`.
+    """
+    set_piecewise_init_condition(state,[jump_location],[q_left,q_right])
+
+
+def set_piecewise_init_condition(state,breakpoints,q_states):
+    r"""Set a piecewise constant initial condition with any number of jumps
+    
+    The domain is split into len(breakpoints) + 1 segments, a cell belongs to
+    segment k if breakpoints[k-1] <= x < breakpoints[k], and q in segment k
+    is set to q_states[k].
+    
+    :Input:
+     - *state* (:class:pyclaw.state.State)
+     - *breakpoints* (list) - Increasing locations of the jumps.
+     - *q_states* (list) - List of the q vectors of each segment.
+    """
+    
+    q_states = np.asarray(q_states,dtype=float)
+    if q_states.shape != (len(breakpoints) + 1,state.num_eqn):
+        raise ValueError("Need one q vector of length %s for each of the %s "
+                         "segments." % (state.num_eqn,len(breakpoints) + 1))
 
     x = state.grid.dimensions[0].centers
-    mx = state.grid.dimensions[0].num_cells
-            
-    for m in xrange(state.num_eqn):
-        state.q[m,:] = (x < jump_location) * q_left[m] * np.ones((mx)) + \
-                       (x >= jump_location) * q_right[m] * np.ones((mx))
+    segment = np.searchsorted(breakpoints,x,side='right')
+    state.q[...] = q_states.T.take(segment,axis=1)
     
 
 def set_quiescent_init_condition(state, single_layer=False):
@@ -45,34 +68,22 @@ def set_wave_family_init_condition(state,wave_family,jump_location,epsilon):
     r = state.problem_data['r']
     rho = state.problem_data['rho']
     g = state.problem_data['g']
+    x = state.grid.dimensions[0].centers
+
+    # Right going families perturb the left of the jump and vice versa
+    if wave_family >= 3:
+        index = x < jump_location
+    else:
+        index = x >= jump_location
+
+    eig_value,alpha = wave_family_eigenvector(state.aux[h_hat_index[0],index],
+                                              state.aux[h_hat_index[1],index],
+                                              r,g,wave_family)
 
-    for (i,x) in enumerate(state.grid.dimensions[0].centers):
-        gamma = state.aux[h_hat_index[1],i] / state.aux[h_hat_index[0],i]
-        if wave_family == 1:
-            alpha = 0.5 * (gamma - 1.0 + np.sqrt((gamma - 1.0)**2 + 4.0 * r * gamma))
-            eig_value = -np.sqrt(g * state.aux[h_hat_index[0],i] * (1.0 + alpha))
-        elif wave_family == 2:
-            alpha = 0.5 * (gamma - 1.0 - np.sqrt((gamma - 1.0)**2 + 4.0 * r * gamma))
-            eig_value = -np.sqrt(g * state.aux[h_hat_index[0],i] * (1.0 + alpha))
-        elif wave_family == 3:
-            alpha = 0.5 * (gamma - 1.0 - np.sqrt((gamma - 1.0)**2 + 4.0 * r * gamma))
-            eig_value = np.sqrt(g * state.aux[h_hat_index[0],i] * (1.0 + alpha))
-        elif wave_family == 4:
-            alpha = 0.5 * (gamma - 1.0 + np.sqrt((gamma - 1.0)**2 + 4.0 * r * gamma))
-            eig_value = np.sqrt(g * state.aux[h_hat_index[0],i] * (1.0 + alpha))
-        else:
-            raise Exception("Unsupported wave family %s requested!" % wave_family)
-            
-        if x < jump_location and wave_family >= 3:
-            state.q[0,i] += rho[0] * epsilon
-            state.q[1,i] += rho[0] * epsilon * eig_value
-            state.q[2,i] += rho[1] * epsilon * alpha
-            state.q[3,i] += rho[1] * epsilon * eig_value * alpha
-        elif x >= jump_location and wave_family < 3:
-            state.q[0,i] += rho[0] * epsilon
-            state.q[1,i] += rho[0] * epsilon * eig_value
-            state.q[2,i] += rho[1] * epsilon * alpha
-            state.q[3,i] += rho[1] * epsilon * eig_value * alpha
+    state.q[0,index] += rho[0] * epsilon
+    state.q[1,index] += rho[0] * epsilon * eig_value
+    state.q[2,index] += rho[1] * epsilon * alpha
+    state.q[3,index] += rho[1] * epsilon * eig_value * alpha
 
 
 def set_gaussian_init_condition(state,A,location,sigma,internal_layer=True):
@@ -117,3 +128,68 @@ def set_acta_numerica_init_condition(state,epsilon):
     deta = epsilon * np.sin((x-xmid) * np.pi / (-80e3 - xmid))
     state.q[2,:] += (x > -130e3) * (x < -80e3) * rho[1] * alpha * deta
     state.q[0,:] += (x > -130e3) * (x < -80e3) * rho[0] * deta * (1.0 - alpha)
+
+
+def set_from_solution(state,path,frame,file_format='ascii',file_prefix='fort'):
+    r"""Set q from a frame of a previous run, remapped conservatively
+    
+    The q and dynamic aux fields (wind and kappa) of *frame* in the output
+    directory *path* are remapped onto the grid of *state*, which may be finer
+    or coarser and need only lie within the previous run's domain.  The 
+    remapping interpolates the cumulative integral of each field at the new 
+    cell edges and differences it, so that the integral of each field over 
+    any new cell matches the previous run's exactly.  The static aux fields, 
+    bathymetry and h_hat, should be set on *state* as usual.  If *frame* has
+    no aux array, e.g. output written with write_aux_init only, the dynamic
+    aux fields of *state* are left as they are, they are set again by
+    :func:`multilayer.step.before_step` on the first step.
+    
+    Returns the time of the frame so that a run can be resumed from it.
+    
+    :Input:
+     - *state* (:class:pyclaw.state.State)
+     - *path* (string) - Output directory of the previous run.
+     - *frame* (int) - Frame to start from.
+    """
+    
+    source = read_solution(frame,path,file_format,file_prefix)
+    source_dim = source.state.grid.dimensions[0]
+    dim = state.grid.dimensions[0]
+    tolerance = 1e-10 * (source_dim.upper - source_dim.lower)
+    if (dim.lower < source_dim.lower - tolerance or 
+        dim.upper > source_dim.upper + tolerance):
+        raise ValueError("The domain [%s,%s] is not contained in the domain "
+                         "[%s,%s] of the solution in %s." 
+                            % (dim.lower,dim.upper,source_dim.lower,
+                               source_dim.upper,path))
+    if source.state.num_eqn != state.num_eqn:
+        raise ValueError("The solution in %s has %s equations, expected %s."
+                            % (path,source.state.num_eqn,state.num_eqn))
+    
+    # Location of each new cell edge relative to the old cells
+    source_edges = np.linspace(source_dim.lower,source_dim.upper,
+                               source_dim.num_cells + 1)
+    edges = np.clip(np.linspace(dim.lower,dim.upper,dim.num_cells + 1),
+                    source_dim.lower,source_dim.upper)
+    source_delta = source_edges[1] - source_edges[0]
+    index = np.clip(np.searchsorted(source_edges,edges,side='right') - 1,
+                    0,source_dim.num_cells - 1)
+    weight = (edges - source_edges[index]) / source_delta
+    delta = np.diff(edges)
+
+    def remap(fields):
+        integral = np.zeros((fields.shape[0],fields.shape[1] + 1))
+        np.cumsum(fields * source_delta,axis=1,out=integral[:,1:])
+        integral = (integral[:,index] 
+                        + weight * (integral[:,index + 1] - integral[:,index]))
+        return np.diff(integral,axis=1) / delta
+
+    state.q[...] = remap(source.state.q)
+    dynamic_indices = SplitAuxOutput(state.problem_data['num_layers'])\
+                                                            .dynamic_indices
+    # Depending on the PyClaw version a missing aux array is None or all NaN
+    source_aux = source.state.aux
+    if source_aux is not None and not np.all(np.isnan(source_aux)):
+        state.aux[dynamic_indices,:] = remap(source_aux[dynamic_indices,:])
+    
+    return source.t
@@ -7,13 +7,21 @@ time step.
                 and checks against the Richardson tolerance.
                 
 *friction_source* - Implements Manning's-N type friction source term
+
+*SpongeLayer* - Absorbing layer source term relaxing toward the quiescent state
+
+*combine_sources* - Combines several source terms into one
 """
 
 import numpy as np
 
 import clawpack.pyclaw.classic as classic
+import clawpack.pyclaw.sharpclaw as sharpclaw
 
-from aux import set_no_wind,kappa_index
+import kernels
+from diagnostics import HyperbolicityLog
+from aux import set_no_wind
+from layout import Layout
 
 class NegativeDepthError(Exception):
     r"""Error raised when depth becomes negative in a layer"""
@@ -34,13 +42,236 @@ class RichardsonExceededError(Exception):
 
 
 
+class StepWorkspace(object):
+    r"""Scratch arrays used by :func:`before_step`
+    
+    The arrays are allocated once for a given number of layers and cells and
+    reused every time step, see :func:`get_workspace`.  Arrays with a leading
+    dimension of num_layers - 1 are indexed by the internal interfaces, 
+    interface k lies between layers k and k+1.
+    
+    :Attributes:
+     - *layout* (:class:`multilayer.layout.Layout`) - Layout of q and aux
+     - *rho* (ndarray(num_layers,1)) - Layer densities
+     - *g_prime* (ndarray(num_layers-1,1)) - Reduced gravity 
+       :math:`g (1 - \rho_k / \rho_{k+1})` at each interface
+     - *h* (ndarray(num_layers,num_cells)) - Layer depths
+     - *u* (ndarray(num_layers,num_cells)) - Layer velocities, zero where dry
+     - *wet* (ndarray(num_layers,num_cells)) - Mask of wet cells in each layer
+     - *negative* (ndarray(num_layers,num_cells)) - Mask of negative depths
+     - *exceeded* (ndarray(num_layers-1,num_cells)) - Mask of cells exceeding
+       the Richardson tolerance at each interface
+     - *work* (ndarray(num_layers-1,num_cells)) - General scratch space
+    """
+    
+    def __init__(self,num_layers,num_cells,rho,g):
+        self.shape = (num_layers,num_cells)
+        self.layout = Layout(num_layers)
+        self.rho = np.array(rho,dtype=float).reshape((num_layers,1))
+        self.g_prime = g * (1.0 - self.rho[:-1] / self.rho[1:])
+        self.h = np.zeros(self.shape)
+        self.u = np.zeros(self.shape)
+        self.wet = np.zeros(self.shape,dtype=bool)
+        self.negative = np.zeros(self.shape,dtype=bool)
+        self.exceeded = np.zeros((num_layers-1,num_cells),dtype=bool)
+        self.work = np.zeros((num_layers-1,num_cells))
+
+
+def get_workspace(state):
+    r"""Return the :class:`StepWorkspace` attached to *state*
+    
+    A new workspace is only allocated the first time this is called for a
+    state or if the number of layers or cells has changed since.  The 
+    densities are read from the state's problem_data at allocation.
+    """
+    shape = (state.problem_data['num_layers'],state.q.shape[1])
+    workspace = getattr(state,'_step_workspace',None)
+    if workspace is None or workspace.shape != shape:
+        workspace = StepWorkspace(shape[0],shape[1],
+                                  state.problem_data['rho'],
+                                  state.problem_data['g'])
+        state._step_workspace = workspace
+    return workspace
+
+
+def set_velocities(state,dry_tolerance,workspace):
+    r"""Set the depths, wet masks and velocities in *workspace* from state.q
+    
+    All layers are handled at once.  Velocities are set to zero where a layer
+    is dry.
+    """
+    depths = workspace.layout.depths(state)
+    np.divide(depths,workspace.rho,out=workspace.h)
+    np.greater(workspace.h,dry_tolerance,out=workspace.wet)
+    workspace.u[...] = 0.0
+    np.divide(workspace.layout.momenta(state),depths,out=workspace.u,
+              where=workspace.wet)
+
+
+def set_kappa(state,dry_tolerance,richardson_tolerance,workspace):
+    r"""Compute kappa at every internal interface and check it
+    
+    Kappa at interface k is
+    
+    .. math::
+        \kappa_k = \frac{(u_k - u_{k+1})^2}{g'_k (h_k + h_{k+1})}
+    
+    and is stored in the aux array rows given by 
+    :meth:`multilayer.layout.Layout.kappa`.  The mask of cells where kappa 
+    exceeds *richardson_tolerance* and the lower layer is wet is left in
+    workspace.exceeded.
+    """
+    h = workspace.h
+    u = workspace.u
+    work = workspace.work
+    kappa = workspace.layout.kappa(state)
+
+    set_velocities(state,dry_tolerance,workspace)
+    np.subtract(u[:-1,:],u[1:,:],out=work)
+    np.square(work,out=work)
+    np.add(h[:-1,:],h[1:,:],out=kappa)
+    np.multiply(workspace.g_prime,kappa,out=kappa)
+    np.divide(work,kappa,out=kappa)
+
+    np.greater(kappa,richardson_tolerance,out=workspace.exceeded)
+    np.logical_and(workspace.exceeded,workspace.wet[1:,:],
+                   out=workspace.exceeded)
+
+
+class RichardsonMonitor(object):
+    r"""Policy controlling on which steps :func:`before_step` checks kappa
+    
+    Kappa is computed and checked against the Richardson tolerance on the 
+    first step and then every *interval* steps.  If *shear_threshold* is set
+    it is also checked whenever the maximum velocity difference across any
+    interface has changed by more than *shear_threshold* since the last 
+    check.  If a *controller* is given, kappa is also checked on every step 
+    that ends on one of the controller's output times, computed as in
+    Controller.run, so that the kappa written out is current.
+    
+    :Input:
+     - *interval* (int) - Maximum number of steps between checks.
+     - *shear_threshold* (float) - Change in the maximum velocity shear that
+       triggers a check.  Default is None, which disables this criterion.
+     - *controller* (:class:pyclaw.controller.Controller) - Controller whose
+       output times should always be checked.  Can also be set after
+       construction.
+    """
+    
+    def __init__(self,interval=1,shear_threshold=None,controller=None):
+        self.interval = interval
+        self.shear_threshold = shear_threshold
+        self.controller = controller
+        self.num_steps = 0
+        self.last_check = None
+        self.last_shear = None
+        self._t0 = None
+        self._output_key = None
+        self._output_times = None
+
+    def output_times(self):
+        r"""Return the output times of the controller as Controller.run does
+
+        For output_style 1 these are num_output_times + 1 equally spaced 
+        times from the initial time to tfinal, for output_style 2 they are
+        the controller's out_times.  Returns None if there is no controller
+        or output is not based on time.
+        """
+        controller = self.controller
+        if controller is None:
+            return None
+        output_style = getattr(controller,'output_style',1)
+        if output_style == 1:
+            key = (output_style,controller.tfinal,controller.num_output_times)
+            if self._output_key != key:
+                # The initial time is recorded on the first step, see due
+                if self._t0 is None:
+                    self._t0 = controller.solution.t
+                self._output_times = np.linspace(self._t0,controller.tfinal,
+                                            controller.num_output_times + 1)
+                self._output_key = key
+            return self._output_times
+        elif output_style == 2:
+            return np.asarray(controller.out_times)
+        return None
+
+    def ends_on_output_time(self,solver,state):
+        r"""Return True if the step about to be taken ends on an output time
+        
+        For output_style 3 this is every nstepout steps.
+        """
+        if self.controller is None or solver.dt is None:
+            return False
+        if getattr(self.controller,'output_style',1) == 3:
+            return (self.num_steps % self.controller.nstepout) == 0
+        out_times = self.output_times()
+        if out_times is None:
+            return False
+        t_end = state.t + solver.dt
+        index = np.searchsorted(out_times,state.t,side='right')
+        return (index < len(out_times) and 
+                out_times[index] <= t_end + 1e-14 * max(abs(t_end),1.0))
+
+    def max_shear(self,state,dry_tolerance):
+        r"""Return the maximum velocity difference across any interface"""
+        workspace = get_workspace(state)
+        set_velocities(state,dry_tolerance,workspace)
+        np.subtract(workspace.u[:-1,:],workspace.u[1:,:],out=workspace.work)
+        np.absolute(workspace.work,out=workspace.work)
+        return np.max(workspace.work)
+
+    def due(self,solver,state,dry_tolerance):
+        r"""Return True if kappa should be checked on this step"""
+        step = self.num_steps
+        self.num_steps += 1
+        if self._t0 is None:
+            self._t0 = state.t
+        
+        shear = None
+        if self.last_check is None or step - self.last_check >= self.interval:
+            check = True
+        elif self.ends_on_output_time(solver,state):
+            check = True
+        elif self.shear_threshold is not None:
+            shear = self.max_shear(state,dry_tolerance)
+            check = abs(shear - self.last_shear) > self.shear_threshold
+        else:
+            check = False
+        
+        if check:
+            self.last_check = step
+            if self.shear_threshold is not None:
+                if shear is None:
+                    shear = self.max_shear(state,dry_tolerance)
+                self.last_shear = shear
+        return check
+
+
+def get_hyperbolicity_log(state):
+    r"""Return the default :class:`HyperbolicityLog` attached to *state*"""
+    hyperbolicity_log = getattr(state,'_hyperbolicity_log',None)
+    if hyperbolicity_log is None:
+        hyperbolicity_log = HyperbolicityLog()
+        state._hyperbolicity_log = hyperbolicity_log
+    return hyperbolicity_log
+
+
 def before_step(solver,state,wind_func=set_no_wind,dry_tolerance=1e-3,
                     richardson_tolerance=0.95,raise_on_negative=False,
-                    raise_on_richardson=False):
+                    raise_on_richardson=False,hyperbolicity_log=None,
+                    richardson_monitor=None,clipping_log=None):
     r"""
     Sets data fields and performs calculations needed before a time
     step is taken.
     
+    Any number of layers, given by problem_data['num_layers'], is supported
+    with one kappa per internal interface (see :func:`set_kappa`).  All
+    temporaries are computed in place in the state's :class:`StepWorkspace`
+    so that no arrays are allocated during a step.  If the compiled kernels 
+    are available (see :mod:`multilayer.kernels`) and 
+    `solver.kernel_language` is 'Fortran' the depth clipping and kappa
+    calculation are done in a single compiled loop over the cells instead.
+    
     :Input:
      - *solver* (:class:pyclaw.solver.Solver)
      - *solution* (:class:pyclaw.solution.Solution)
@@ -49,89 +280,332 @@ def before_step(solver,state,wind_func=set_no_wind,dry_tolerance=1e-3,
      - *richardson_tolerance* (float)
      - *raise_on_negative* (bool)
      - *raise_on_richardson* (bool)
+     - *hyperbolicity_log* (:class:`multilayer.diagnostics.HyperbolicityLog`)
+       - Log that cells exceeding the Richardson tolerance are recorded in if
+       *raise_on_richardson* is False.  Defaults to the log attached to the 
+       state, see :func:`get_hyperbolicity_log`.
+     - *richardson_monitor* (:class:`RichardsonMonitor`) - Controls on which
+       steps kappa is computed and checked.  By default this is every step.
+       Negative depths are clipped and the wind set every step regardless.
+     - *clipping_log* (:class:`multilayer.diagnostics.ClippingLog`) - If 
+       given the mass and momentum changed in each layer by clipping negative
+       depths is recorded in this log.  Default is None.
     
     :Output:
     
     :Raises:
-      - (Exception) - Richardson tolerance exceeded.  Only raised if 
-        raise_on_fail is set to True.
+      - (NegativeDepthError) - Negative depth found.  Only raised if 
+        raise_on_negative is set to True.
+      - (RichardsonExceededError) - Richardson tolerance exceeded.  Only 
+        raised if raise_on_richardson is set to True.
     """
     
     # Extract relevant data
     num_layers = state.problem_data['num_layers']
-    rho = state.problem_data['rho']
-    g = state.problem_data['g']
-    one_minus_r = state.problem_data['one_minus_r']
     x = state.grid.dimensions[0].centers
     
     # State arrays
     q = state.q
     aux = state.aux
+    workspace = get_workspace(state)
+    layout = workspace.layout
+    depths = layout.depths(q)
+    momenta = layout.momenta(q)
+    exceeded = workspace.exceeded
+    if hyperbolicity_log is None:
+        hyperbolicity_log = get_hyperbolicity_log(state)
+    step = solver.status.get('numsteps',0)
     
-    # Zero out negative values
-    for layer in xrange(num_layers):
-        m = num_layers * layer
-        negative_indices = (q[m,:] < 0.0).nonzero()[0]
-        q[m,negative_indices] = 0.0
-        q[m+1,negative_indices] = 0.0
-        
-        if raise_on_negative:
-            if len(negative_indices) < 0:
-                locations = x[negative_indices]
-                raise NegativeDepthError(layer,locations)
-    
+    # Decide whether kappa needs to be checked this step
+    if richardson_monitor is None:
+        check_kappa = True
+    else:
+        check_kappa = richardson_monitor.due(solver,state,dry_tolerance)
     
     # Set wind field
     wind_func(state)
     
-    # Calculate kappa
-    h = np.zeros((num_layers,q.shape[1]))
-    u = np.zeros(h.shape)
-    for layer in xrange(num_layers):
-        layer_index = 2*layer
-        h[layer,:] = state.q[layer_index,:] / rho[layer]
-        wet_index = h[layer,:] > dry_tolerance
-        u[layer,wet_index] = state.q[layer_index+1,wet_index] / state.q[layer_index,wet_index]
-    aux[kappa_index,:] = (u[0,:] - u[1,:])**2 / (g * one_minus_r * (h[0,:] + h[1,:]))
-    if np.any(aux[kappa_index,wet_index] > richardson_tolerance):
+    if kernels.use_compiled(solver) and not raise_on_negative:
+        # Clip depths, compute kappa and count the cells exceeding the
+        # tolerance in a single compiled loop
+        num_exceeded,clipped_mass,clipped_momentum = \
+                kernels.fortran.before_step_kernel(q,aux,
+                                            workspace.rho[:,0],
+                                            workspace.g_prime[:,0],
+                                            dry_tolerance,
+                                            richardson_tolerance,
+                                            layout.kappa_slice.start + 1,
+                                            check_kappa)
+        if clipping_log is not None and np.any(clipped_mass > 0.0):
+            dx = state.grid.delta[0]
+            clipping_log.record(state.t,step,clipped_mass * dx,
+                                clipped_momentum * dx)
+        if num_exceeded > 0:
+            kappa = layout.kappa(aux)
+            np.divide(depths,workspace.rho,out=workspace.h)
+            np.greater(workspace.h,dry_tolerance,out=workspace.wet)
+            np.greater(kappa,richardson_tolerance,out=exceeded)
+            np.logical_and(exceeded,workspace.wet[1:,:],out=exceeded)
+        else:
+            exceeded[...] = False
+    else:
+        # Zero out negative values in all layers
+        negative = workspace.negative
+        np.less(depths,0.0,out=negative)
+        if clipping_log is not None and np.any(negative):
+            # Account for the mass added and momentum removed, h and u are
+            # free to use as scratch space here
+            dx = state.grid.delta[0]
+            np.minimum(depths,0.0,out=workspace.h)
+            np.multiply(momenta,negative,out=workspace.u)
+            clipping_log.record(state.t,step,
+                                -np.sum(workspace.h,axis=1) * dx,
+                                np.sum(workspace.u,axis=1) * dx)
+        np.copyto(depths,0.0,where=negative)
+        np.copyto(momenta,0.0,where=negative)
+        
+        if raise_on_negative:
+            for layer in xrange(num_layers):
+                negative_indices = negative[layer,:].nonzero()[0]
+                if len(negative_indices) > 0:
+                    locations = x[negative_indices]
+                    raise NegativeDepthError(layer,locations)
+        
+        if check_kappa:
+            set_kappa(state,dry_tolerance,richardson_tolerance,workspace)
+        else:
+            exceeded[...] = False
+    
+    if np.any(exceeded):
         # Actually calculate where the indices failed
-        bad_indices = (aux[kappa_index,wet_index] > richardson_tolerance).nonzero()[0]
+        interfaces,bad_indices = exceeded.nonzero()
         if raise_on_richardson:
             state.aux = aux
-            raise RichardsonExceededError(bad_indices,state)
+            raise RichardsonExceededError(np.unique(bad_indices),state)
         else:
-            print "Hyperbolicity may have failed at the following points:"
-            for i in bad_indices:
-                print "\tkappa(%s) = %s" % (i,aux[kappa_index,i])
+            kappa = layout.kappa(aux)
+            hyperbolicity_log.record(state.t,step,bad_indices,
+                                     kappa[interfaces,bad_indices],
+                                     interfaces=interfaces)
+    hyperbolicity_log.summarize(step)
 
 
+def friction_damping(state,dt):
+    r"""Compute the implicit damping factor of the friction source term
+    
+    Returns a mask of the cells where the bottom layer is dry, and so where
+    the friction acts on the top layer, and the factor :math:`1 + \Delta t
+    \gamma` for every cell.
+    """
+    manning = state.problem_data['manning']
+    g = state.problem_data['g']
+    rho = state.problem_data['rho']
+    dry_tolerance = state.problem_data['dry_tolerance']
+    q = state.q
+
+    # Pick the active layer, the top layer is used where the bottom layer is
+    # dry.  Where the bottom layer is wet u is deliberately set to its depth h
+    # and not its velocity, for parity with the legacy loop and the
+    # friction_kernel in kernels.f90.
+    h = q[2,:] / rho[1]
+    u = q[2,:] / rho[1]
+    bottom_dry = h < dry_tolerance
+    h[bottom_dry] = q[0,bottom_dry] / rho[0]
+    u[bottom_dry] = q[1,bottom_dry] / rho[0]
+    
+    # 4/3 is integer division so the exponent is deliberately 1, again for
+    # parity with the legacy loop and friction_kernel
+    gamma = u * g * manning**2 / h**(4/3)
+    return bottom_dry,1.0 + dt * gamma
+
+
+def friction_coefficient(state):
+    r"""Compute the Manning's-N friction coefficient of the active layer
+
+    Returns a mask of the cells where the bottom layer is dry, and so where
+    the friction acts on the top layer, and
+
+    .. math::
+        \gamma = \frac{g n^2 |u|}{h^{4/3}}
+
+    of the active layer in every cell, zero where that layer is dry too.
+    Unlike :func:`friction_damping` this uses the layer velocity and the 4/3
+    exponent, it is used by the SharpClaw source term which has no legacy
+    results to match.
+    """
+    manning = state.problem_data['manning']
+    g = state.problem_data['g']
+    rho = state.problem_data['rho']
+    dry_tolerance = state.problem_data['dry_tolerance']
+    q = state.q
+
+    bottom_dry = q[2,:] / rho[1] < dry_tolerance
+    h = np.where(bottom_dry,q[0,:] / rho[0],q[2,:] / rho[1])
+    hu = np.where(bottom_dry,q[1,:] / rho[0],q[3,:] / rho[1])
+
+    gamma = np.zeros(h.shape)
+    wet = h >= dry_tolerance
+    gamma[wet] = (g * manning**2 * np.abs(hu[wet] / h[wet])
+                                                / h[wet]**(4.0 / 3.0))
+    return bottom_dry,gamma
+
 
 def friction_source(solver,state,dt,TOLERANCE=1e-30):
-    r""""""
-
-    if state.problem_data['manning'] != 0.0:
-        if isinstance(solver, classic.solver.ClawSolver1D):
-            manning = state.problem_data['manning']
-            g = state.problem_data['g']
-            rho = state.problem_data['rho']
-            dry_tolerance = state.problem_data['dry_tolerance']
-            
-            if manning > TOLERANCE:
-                for i in xrange(state.q.shape[1]):
-                    h = state.q[2,i] / rho[1]
-                    if h < dry_tolerance:
-                        h = state.q[0,i] / rho[0]
-                        u = state.q[1,i] / rho[0]
-                        layer_index = 0
-                    else:
-                        u = state.q[2,i] / rho[1]
-                        layer_index = 1
-                
-                    gamma = u * g * manning**2 / h**(4/3)
-                    dgamma = 1.0 + dt * gamma
-                    hu_index = 2 * (layer_index) + 1
-                    state.q[hu_index,i] = state.q[hu_index,i] / dgamma * rho[layer_index]
-        elif isinstance(solver, SharpClawSolver):
-            pass
+    r"""Manning's-N type friction source term
+
+    The friction is applied to the bottom layer where it is wet and to the top
+    layer where the bottom layer is dry.  The implicit update 
+    :math:`hu / (1 + \Delta t \gamma)` is evaluated for all cells at once
+    using a dry-bottom-layer mask to pick the active layer, see
+    :func:`friction_damping`.
+    
+    For the classic solver the momenta in state.q are updated in place and 
+    this should be used as the solver's step_source.  For SharpClaw the 
+    change in q over *dt*, :math:`-\Delta t \gamma hu / (1 + \Delta t
+    \gamma)`, is returned instead so that this can be used as the solver's
+    dq_src and is evaluated in each Runge-Kutta stage.  The classic update
+    keeps the legacy form of gamma, see :func:`friction_damping`, while
+    SharpClaw uses :func:`friction_coefficient`.
+
+    For the classic solver the compiled version in :mod:`multilayer.kernels`
+    is used if it is enabled and the solver's kernel_language is 'Fortran'.
+    
+    :Input:
+     - *solver* (:class:pyclaw.solver.Solver)
+     - *state* (:class:pyclaw.state.State)
+     - *dt* (float)
+     - *TOLERANCE* (float) - Values of Manning's N below this are treated as
+       zero.
+    """
+
+    manning = state.problem_data['manning']
+    rho = state.problem_data['rho']
+    q = state.q
+
+    if isinstance(solver, classic.solver.ClawSolver1D):
+        if manning > TOLERANCE and kernels.use_compiled(solver):
+            kernels.fortran.friction_kernel(q,rho,state.problem_data['g'],
+                                            manning,dt,
+                                            state.problem_data['dry_tolerance'])
+        elif manning > TOLERANCE:
+            bottom_dry,dgamma = friction_damping(state,dt)
+            bottom_wet = ~bottom_dry
+            q[1,bottom_dry] = q[1,bottom_dry] / dgamma[bottom_dry] * rho[0]
+            q[3,bottom_wet] = q[3,bottom_wet] / dgamma[bottom_wet] * rho[1]
+    elif isinstance(solver, sharpclaw.solver.SharpClawSolver1D):
+        if manning > TOLERANCE:
+            bottom_dry,gamma = friction_coefficient(state)
+            bottom_wet = ~bottom_dry
+            damping = -dt * gamma / (1.0 + dt * gamma)
+            dq = np.zeros(q.shape)
+            dq[1,bottom_dry] = damping[bottom_dry] * q[1,bottom_dry]
+            dq[3,bottom_wet] = damping[bottom_wet] * q[3,bottom_wet]
+            return dq
         else:
-            raise ValueError("Solver type %s not supported." % type(solver))
+            # No friction, SharpClaw adds this to the stage update
+            return 0.0
+    elif manning != 0.0:
+        raise ValueError("Solver type %s not supported." % type(solver))
+
+
+class SpongeLayer(object):
+    r"""Absorbing sponge layer source term at one of the boundaries
+
+    Within *width* of the boundary the layer depths are relaxed toward the
+    quiescent depths given by h_hat and the momenta toward zero at the rate
+    
+    .. math::
+        \sigma(x) = \sigma_{max} (1 - d / w)^p
+        
+    where d is the distance from the boundary, so that outgoing waves are
+    damped instead of being reflected.  The relaxation is done implicitly,
+    :math:`q \leftarrow q^* + (q - q^*) / (1 + \Delta t \sigma)`, and only 
+    on the cells inside the layer.  The rate and target state are computed 
+    the first time the source is called for a grid, keyed on the grid's 
+    extent and number of cells so that the copies of the state made for the
+    SharpClaw Runge-Kutta stages reuse them.  As with 
+    :func:`friction_source` the update is done in place for the classic 
+    solver and the change in q is returned for SharpClaw.  Use
+    :func:`combine_sources` to use this together with other source terms.
+    
+    :Input:
+     - *width* (float) - Width of the sponge layer.
+     - *boundary* (string) - Boundary the layer is attached to, either 
+       'lower' or 'upper'.  Default is 'lower'.
+     - *strength* (float) - Maximum relaxation rate :math:`\sigma_{max}`
+       reached at the boundary.  Default is 0.01.
+     - *power* (float) - Power p of the ramp.  Default is 2.
+    """
+
+    def __init__(self,width,boundary='lower',strength=1e-2,power=2):
+        if boundary not in ['lower','upper']:
+            raise ValueError("Boundary must be 'lower' or 'upper'.")
+        self.width = width
+        self.boundary = boundary
+        self.strength = strength
+        self.power = power
+        self._grid_key = None
+
+    def setup(self,state):
+        r"""Compute the relaxation rate and target state on the grid of state
+        """
+        dimension = state.grid.dimensions[0]
+        x = dimension.centers
+        if self.boundary == 'lower':
+            distance = x - dimension.lower
+        else:
+            distance = dimension.upper - x
+        inside = np.nonzero(distance < self.width)[0]
+        if len(inside) == 0:
+            self.region = slice(0,0)
+        else:
+            self.region = slice(inside[0],inside[-1] + 1)
+
+        self.sigma = self.strength * (1.0 - distance[self.region] 
+                                                / self.width)**self.power
+        self.layout = Layout(state.problem_data['num_layers'])
+        rho = np.array(state.problem_data['rho'],dtype=float)
+        self.target = (rho.reshape((-1,1)) 
+                        * self.layout.h_hat(state)[:,self.region])
+        self._grid_key = _grid_key(state)
+
+    def __call__(self,solver,state,dt):
+        if _grid_key(state) != self._grid_key:
+            self.setup(state)
+        
+        depths = self.layout.depths(state)[:,self.region]
+        momenta = self.layout.momenta(state)[:,self.region]
+        damping = 1.0 / (1.0 + dt * self.sigma)
+        new_depths = self.target + (depths - self.target) * damping
+        new_momenta = momenta * damping
+
+        if isinstance(solver, sharpclaw.solver.SharpClawSolver1D):
+            dq = np.zeros(state.q.shape)
+            self.layout.depths(dq)[:,self.region] = new_depths - depths
+            self.layout.momenta(dq)[:,self.region] = new_momenta - momenta
+            return dq
+        else:
+            depths[...] = new_depths
+            momenta[...] = new_momenta
+
+
+def _grid_key(state):
+    dimension = state.grid.dimensions[0]
+    return (dimension.lower,dimension.upper,dimension.num_cells)
+
+
+def combine_sources(*sources):
+    r"""Return a source term applying each of *sources* in turn
+    
+    For the classic solver each source updates state.q in place one after the
+    other, for SharpClaw the changes in q returned by each source are summed.
+    """
+    def source(solver,state,dt):
+        if isinstance(solver, sharpclaw.solver.SharpClawSolver1D):
+            dq = 0.0
+            for term in sources:
+                dq = dq + term(solver,state,dt)
+            return dq
+        for term in sources:
+            term(solver,state,dt)
+    return source
@@ -0,0 +1,145 @@
+# encoding: utf-8
+r"""
+Module containing opt-in timing instrumentation for the per-step hooks.
+
+Nothing in this module is used unless a :class:`StepTimer` is explicitly
+attached to a solver and controller, so there is no overhead when timing is
+not requested.  Typical usage in a driver is::
+
+    timer = ml.timing.StepTimer()
+    timer.instrument(solver, controller)
+    controller.run()
+    timer.write_report(log_path)
+"""
+
+import os
+import csv
+import json
+import timeit
+
+class StepTimer(object):
+    r"""Wall clock timer for the hooks called each time step
+
+    Each instrumented hook is replaced by a wrapper recording the number of
+    calls, the cumulative time and the minimum and maximum time per call.
+    The phases instrumented by :meth:`instrument` are
+
+     - *hyperbolic* - The hyperbolic step including the Riemann solves, for
+       the classic solver this includes the boundary condition fills
+     - *before_step* - The solver's before_step function
+     - *source* - The step_source (classic) or dq_src (SharpClaw) function
+     - *user_bc_lower*, *user_bc_upper* - User boundary condition functions
+     - *output* - Writing of output frames
+     - *run* - The whole of controller.run()
+
+    :Input:
+     - *keep_calls* (bool) - If True the time of every call is also kept and
+       included in the JSON report.  Default is False.
+    """
+
+    fields = ['phase','calls','total','mean','min','max','fraction']
+
+    def __init__(self,keep_calls=False):
+        self.keep_calls = keep_calls
+        self.timings = {}
+        self.calls = {}
+
+    def wrap(self,name,func):
+        r"""Return *func* wrapped so that its calls are timed under *name*"""
+        if func is None:
+            return None
+
+        timing = self.timings.setdefault(name,[0,0.0,float('inf'),0.0])
+        calls = self.calls.setdefault(name,[])
+        keep_calls = self.keep_calls
+        timer = timeit.default_timer
+
+        def timed_func(*args,**kargs):
+            start = timer()
+            try:
+                return func(*args,**kargs)
+            finally:
+                elapsed = timer() - start
+                timing[0] += 1
+                timing[1] += elapsed
+                timing[2] = min(timing[2],elapsed)
+                timing[3] = max(timing[3],elapsed)
+                if keep_calls:
+                    calls.append(elapsed)
+
+        return timed_func
+
+    def instrument(self,solver,controller=None):
+        r"""Wrap the per-step hooks of *solver* and the output of *controller*
+
+        This should be called after all of the hooks have been set on the
+        solver and the solution has been attached to the controller.
+        """
+        if hasattr(solver,'step_hyperbolic'):
+            solver.step_hyperbolic = self.wrap('hyperbolic',
+                                               solver.step_hyperbolic)
+        elif hasattr(solver,'dq_hyperbolic'):
+            solver.dq_hyperbolic = self.wrap('hyperbolic',
+                                             solver.dq_hyperbolic)
+        solver.before_step = self.wrap('before_step',solver.before_step)
+        if getattr(solver,'step_source',None) is not None:
+            solver.step_source = self.wrap('source',solver.step_source)
+        if getattr(solver,'dq_src',None) is not None:
+            solver.dq_src = self.wrap('source',solver.dq_src)
+        for name in ['user_bc_lower','user_bc_upper']:
+            if getattr(solver,name,None) is not None:
+                setattr(solver,name,self.wrap(name,getattr(solver,name)))
+
+        if controller is not None:
+            controller.run = self.wrap('run',controller.run)
+            if controller.solution is not None:
+                controller.solution.write = self.wrap('output',
+                                                controller.solution.write)
+
+    def report(self):
+        r"""Return a list of dictionaries, one per phase, of the timings"""
+        if 'run' in self.timings:
+            run_time = self.timings['run'][1]
+        else:
+            run_time = sum([timing[1] for timing in self.timings.itervalues()])
+
+        rows = []
+        for (name,timing) in sorted(self.timings.iteritems()):
+            (num_calls,total,min_time,max_time) = timing
+            row = {'phase':name,'calls':num_calls,'total':total}
+            if num_calls > 0:
+                row['mean'] = total / num_calls
+                row['min'] = min_time
+                row['max'] = max_time
+            else:
+                row['mean'] = row['min'] = row['max'] = 0.0
+            if run_time > 0.0:
+                row['fraction'] = total / run_time
+            else:
+                row['fraction'] = 0.0
+            rows.append(row)
+        return rows
+
+    def write_report(self,log_path):
+        r"""Write JSON and CSV timing reports next to *log_path*
+
+        The reports are named after the log file with the extension replaced
+        by '_timing.json' and '_timing.csv'.  Returns the two paths.
+        """
+        base_path = os.path.splitext(log_path)[0]
+        json_path = base_path + '_timing.json'
+        csv_path = base_path + '_timing.csv'
+        rows = self.report()
+
+        record = {'phases':rows}
+        if self.keep_calls:
+            record['calls'] = self.calls
+        with open(json_path,'w') as json_file:
+            json.dump(record,json_file,indent=2)
+
+        with open(csv_path,'wb') as csv_file:
+            writer = csv.DictWriter(csv_file,self.fields)
+            writer.writerow(dict((field,field) for field in self.fields))
+            writer.writerows(rows)
+
+        return json_path,csv_path
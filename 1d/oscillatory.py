@@ -3,6 +3,8 @@
 
 r""" Run the suite of tests for the 1d two-layer equations"""
 
+import os
+
 from clawpack.riemann import layered_shallow_water_1D
 import clawpack.clawutil.runclaw as runclaw
 from clawpack.pyclaw.plot import plot
@@ -33,10 +35,17 @@ def oscillatory_wind(num_cells,eigen_method,**kargs):
     # =================
     # = Create Solver =
     # =================
-    if kargs.get('solver_type','classic') == 'classic':
+    solver_type = kargs.get('solver_type', 'classic')
+    if solver_type == 'classic':
         solver = pyclaw.ClawSolver1D(riemann_solver=layered_shallow_water_1D)
+        solver.limiters = 3
+        solver.source_split = 1
+    elif solver_type == 'sharpclaw':
+        solver = pyclaw.SharpClawSolver1D(
+                                    riemann_solver=layered_shallow_water_1D)
     else:
-        raise NotImplementedError('Classic is currently the only supported solver.')
+        raise NotImplementedError('Solver type %s is not supported.' 
+                                                                % solver_type)
         
     # Solver method parameters
     solver.cfl_desired = 0.9
@@ -44,8 +53,6 @@ def oscillatory_wind(num_cells,eigen_method,**kargs):
     solver.max_steps = 5000
     solver.fwave = True
     solver.kernel_language = 'Fortran'
-    solver.limiters = 3
-    solver.source_split = 1
         
     # Boundary conditions
     # Here we implement our own wall boundary conditions for the multi-layer 
@@ -58,14 +65,16 @@ def oscillatory_wind(num_cells,eigen_method,**kargs):
     solver.aux_bc_upper[0] = 1
 
     # Set the before step functioning including the wind forcing
-    wind_func = lambda state:ml.aux.set_oscillatory_wind(state,
-                                        A=5.0, N=2.0, omega=2.0, t_length=10.0)
+    wind_func = ml.aux.OscillatoryWind(A=5.0, N=2.0, omega=2.0, t_length=10.0)
     solver.before_step = lambda solver, solution:ml.step.before_step(solver, 
                                             solution, wind_func=wind_func, 
                                             raise_on_richardson=True)
                                             
     # Use simple friction source term
-    solver.step_source = ml.step.friction_source
+    if solver_type == 'classic':
+        solver.step_source = ml.step.friction_source
+    else:
+        solver.dq_src = ml.step.friction_source
     
     # ============================
     # = Create Initial Condition =
@@ -74,8 +83,8 @@ def oscillatory_wind(num_cells,eigen_method,**kargs):
     
     x = pyclaw.Dimension(0.0, 1.0, num_cells)
     domain = pyclaw.Domain([x])
-    state = pyclaw.State(domain, 2 * num_layers, 3 + num_layers)
-    state.aux[ml.aux.kappa_index,:] = 0.0
+    state = pyclaw.State(domain, 2 * num_layers, ml.aux.num_aux(num_layers))
+    state.aux[ml.aux.kappa_slice(num_layers),:] = 0.0
 
     # Set physics data
     state.problem_data['g'] = 9.8
@@ -118,8 +127,18 @@ def oscillatory_wind(num_cells,eigen_method,**kargs):
     controller.write_aux_init = True
     controller.outdir = outdir
     controller.keep_copy = True
-    controller.write_aux_always = True
     
+    # Write the static aux fields once and the wind and kappa every frame
+    if kargs.get('split_aux', True):
+        ml.output.SplitAuxOutput(num_layers).attach(controller)
+    else:
+        controller.write_aux_always = True
+    
+    # Optionally time each phase of the time step
+    if kargs.get('timing', False):
+        timer = ml.timing.StepTimer()
+        timer.instrument(solver, controller)
+
     # ==================
     # = Run Simulation =
     # ==================
@@ -129,6 +148,10 @@ def oscillatory_wind(num_cells,eigen_method,**kargs):
         print e
         # print "Writing out last solution available to frame %s." % str(len(controller.frames))
         # e.solution.write(len(controller.frames),path=controller.outdir,write_aux=True)
+    if kargs.get('timing', False):
+        timer.write_report(log_path)
+    ml.step.get_hyperbolicity_log(solution.state).save(
+                        os.path.splitext(log_path)[0] + '_hyperbolicity.json')
     
     # ============
     # = Plotting =
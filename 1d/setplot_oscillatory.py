@@ -34,6 +34,7 @@ import matplotlib.pyplot as mpl
 from clawpack.pyclaw.solution import Solution
 
 from multilayer.aux import bathy_index,kappa_index,wind_index
+from multilayer.output import read_aux
 import multilayer.plot as plot
 
 #--------------------------
@@ -58,10 +59,10 @@ def setplot(plotdata,xlower,xupper,rho,dry_tolerance):
         return b
     
     def kappa(cd):
-        return Solution(cd.frameno,path=plotdata.outdir,read_aux=True).state.aux[kappa_index,:]
+        return read_aux(cd.frameno,path=plotdata.outdir)[kappa_index,:]
 
     def wind(cd):
-        return Solution(cd.frameno,path=plotdata.outdir,read_aux=True).state.aux[wind_index,:]
+        return read_aux(cd.frameno,path=plotdata.outdir)[wind_index,:]
     
     def h_1(cd):
         return cd.q[0,:] / rho[0]
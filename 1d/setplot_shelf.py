@@ -33,6 +33,7 @@ import matplotlib.pyplot as mpl
 from clawpack.pyclaw.solution import Solution
 
 from multilayer.aux import bathy_index,kappa_index,wind_index
+from multilayer.output import read_aux
 import multilayer.plot as plot
 
 # matplotlib.rcParams['figure.figsize'] = [6.0,10.0]
@@ -54,10 +55,10 @@ def setplot(plotdata,eta=[0.0,-300.0],rho=[1025.0,1045.0],g=9.81,dry_tolerance=1
         return b
 
     def kappa(cd):
-        return Solution(cd.frameno,path=plotdata.outdir,read_aux=True).state.aux[kappa_index,:]
+        return read_aux(cd.frameno,path=plotdata.outdir)[kappa_index,:]
 
     def wind(cd):
-        return Solution(cd.frameno,path=plotdata.outdir,read_aux=True).state.aux[wind_index,:]
+        return read_aux(cd.frameno,path=plotdata.outdir)[wind_index,:]
     
     def h_1(cd):
         return cd.q[0,:] / rho[0]
@@ -3,6 +3,7 @@
 
 r"""Runs idealized jump and sloped 1d shelf tests"""
 
+import os
 import sys
 
 from clawpack.riemann import layered_shallow_water_1D
@@ -16,6 +17,8 @@ def jump_shelf(num_cells,eigen_method,**kargs):
 
     # Construct output and plot directory paths
     prefix = 'ml_e%s_n%s' % (eigen_method,num_cells)
+    if kargs.get('sponge_width', None) is not None:
+        prefix = "".join((prefix, "_s%s" % int(kargs['sponge_width'])))
     name = 'multilayer/jump_shelf'
     outdir,plotdir,log_path = runclaw.create_output_paths(name,prefix,**kargs)
     
@@ -34,10 +37,17 @@ def jump_shelf(num_cells,eigen_method,**kargs):
     # =================
     # = Create Solver =
     # =================
-    if kargs.get('solver_type','classic') == 'classic':
+    solver_type = kargs.get('solver_type', 'classic')
+    if solver_type == 'classic':
         solver = pyclaw.ClawSolver1D(riemann_solver=layered_shallow_water_1D)
+        solver.limiters = 3
+        solver.source_split = 1
+    elif solver_type == 'sharpclaw':
+        solver = pyclaw.SharpClawSolver1D(
+                                    riemann_solver=layered_shallow_water_1D)
     else:
-        raise NotImplementedError('Classic is currently the only supported solver.')
+        raise NotImplementedError('Solver type %s is not supported.' 
+                                                                % solver_type)
         
     # Solver method parameters
     solver.cfl_desired = 0.9
@@ -45,8 +55,6 @@ def jump_shelf(num_cells,eigen_method,**kargs):
     solver.max_steps = 5000
     solver.fwave = True
     solver.kernel_language = 'Fortran'
-    solver.limiters = 3
-    solver.source_split = 1
         
     # Boundary conditions
     # Use wall boundary condition at beach
@@ -61,18 +69,29 @@ def jump_shelf(num_cells,eigen_method,**kargs):
                                                                     solution)
                                             
     # Use simple friction source term
-    solver.step_source = ml.step.friction_source
+    if solver_type == 'classic':
+        solver.step_source = ml.step.friction_source
+    else:
+        solver.dq_src = ml.step.friction_source
 
+    # Optionally absorb outgoing waves in a sponge layer at the open boundary
+    if kargs.get('sponge_width', None) is not None:
+        sponge = ml.step.SpongeLayer(kargs['sponge_width'], boundary='lower')
+        if solver_type == 'classic':
+            solver.step_source = ml.step.combine_sources(solver.step_source,
+                                                         sponge)
+        else:
+            solver.dq_src = ml.step.combine_sources(solver.dq_src, sponge)
     
     # ============================
     # = Create Initial Condition =
     # ============================
     num_layers = 2
     
-    x = pyclaw.Dimension(-400e3, 0.0, num_cells)
+    x = pyclaw.Dimension(kargs.get('domain_lower', -400e3), 0.0, num_cells)
     domain = pyclaw.Domain([x])
-    state = pyclaw.State(domain, 2 * num_layers, 3 + num_layers)
-    state.aux[ml.aux.kappa_index,:] = 0.0
+    state = pyclaw.State(domain, 2 * num_layers, ml.aux.num_aux(num_layers))
+    state.aux[ml.aux.kappa_slice(num_layers),:] = 0.0
 
     # Set physics data
     state.problem_data['g'] = 9.8
@@ -116,12 +135,26 @@ def jump_shelf(num_cells,eigen_method,**kargs):
     # controller.out_times = [0.0,720.0,2400.0,4800.0,7200.0]
     controller.write_aux_init = True
     controller.outdir = outdir
-    controller.write_aux = True
     
+    # Write the static aux fields once and the wind and kappa every frame
+    if kargs.get('split_aux', True):
+        ml.output.SplitAuxOutput(num_layers).attach(controller)
+    else:
+        controller.write_aux_always = True
+    
+    # Optionally time each phase of the time step
+    if kargs.get('timing', False):
+        timer = ml.timing.StepTimer()
+        timer.instrument(solver, controller)
+
     # ==================
     # = Run Simulation =
     # ==================
     state = controller.run()
+    if kargs.get('timing', False):
+        timer.write_report(log_path)
+    ml.step.get_hyperbolicity_log(solution.state).save(
+                        os.path.splitext(log_path)[0] + '_hyperbolicity.json')
     
     # ============
     # = Plotting =
@@ -135,12 +168,16 @@ def jump_shelf(num_cells,eigen_method,**kargs):
          htmlplot=kargs.get('htmlplot', False), iplot=kargs.get('iplot', False),
          file_format=controller.output_format, **plot_kargs)
 
+    return controller
+
          
 def sloped_shelf(num_cells,eigen_method,**kargs):
     r"""Shelf test"""
 
     # Construct output and plot directory paths
     prefix = 'ml_e%s_n%s' % (eigen_method, num_cells)
+    if kargs.get('sponge_width', None) is not None:
+        prefix = "".join((prefix, "_s%s" % int(kargs['sponge_width'])))
     name = 'multilayer/sloped_shelf'
     outdir,plotdir,log_path = runclaw.create_output_paths(name, prefix, **kargs)
     
@@ -159,10 +196,17 @@ def sloped_shelf(num_cells,eigen_method,**kargs):
     # =================
     # = Create Solver =
     # =================
-    if kargs.get('solver_type', 'classic') == 'classic':
+    solver_type = kargs.get('solver_type', 'classic')
+    if solver_type == 'classic':
         solver = pyclaw.ClawSolver1D(riemann_solver=layered_shallow_water_1D)
+        solver.limiters = 3
+        solver.source_split = 1
+    elif solver_type == 'sharpclaw':
+        solver = pyclaw.SharpClawSolver1D(
+                                    riemann_solver=layered_shallow_water_1D)
     else:
-        raise NotImplementedError('Classic is currently the only supported solver.')
+        raise NotImplementedError('Solver type %s is not supported.' 
+                                                                % solver_type)
         
     # Solver method parameters
     solver.cfl_desired = 0.9
@@ -171,8 +215,6 @@ def sloped_shelf(num_cells,eigen_method,**kargs):
     solver.fwave = True
     solver.kernel_language = 'Fortran'
     solver.num_waves = 4
-    solver.limiters = 3
-    solver.source_split = 1
         
     # Boundary conditions
     # Use wall boundary condition at beach
@@ -190,18 +232,29 @@ def sloped_shelf(num_cells,eigen_method,**kargs):
                                                                      solution)
                                             
     # Use simple friction source term
-    solver.step_source = ml.step.friction_source
+    if solver_type == 'classic':
+        solver.step_source = ml.step.friction_source
+    else:
+        solver.dq_src = ml.step.friction_source
 
+    # Optionally absorb outgoing waves in a sponge layer at the open boundary
+    if kargs.get('sponge_width', None) is not None:
+        sponge = ml.step.SpongeLayer(kargs['sponge_width'], boundary='lower')
+        if solver_type == 'classic':
+            solver.step_source = ml.step.combine_sources(solver.step_source,
+                                                         sponge)
+        else:
+            solver.dq_src = ml.step.combine_sources(solver.dq_src, sponge)
     
     # ============================
     # = Create Initial Condition =
     # ============================
     num_layers = 2
     
-    x = pyclaw.Dimension(-400e3, 0.0, num_cells)
+    x = pyclaw.Dimension(kargs.get('domain_lower', -400e3), 0.0, num_cells)
     domain = pyclaw.Domain([x])
-    state = pyclaw.State(domain, 2 * num_layers, 3 + num_layers)
-    state.aux[ml.aux.kappa_index,:] = 0.0
+    state = pyclaw.State(domain, 2 * num_layers, ml.aux.num_aux(num_layers))
+    state.aux[ml.aux.kappa_slice(num_layers),:] = 0.0
 
     # Set physics data
     state.problem_data['g'] = 9.8
@@ -246,12 +299,26 @@ def sloped_shelf(num_cells,eigen_method,**kargs):
 
     controller.write_aux_init = True
     controller.outdir = outdir
-    controller.write_aux = True
     
+    # Write the static aux fields once and the wind and kappa every frame
+    if kargs.get('split_aux', True):
+        ml.output.SplitAuxOutput(num_layers).attach(controller)
+    else:
+        controller.write_aux_always = True
+    
+    # Optionally time each phase of the time step
+    if kargs.get('timing', False):
+        timer = ml.timing.StepTimer()
+        timer.instrument(solver, controller)
+
     # ==================
     # = Run Simulation =
     # ==================
     state = controller.run()
+    if kargs.get('timing', False):
+        timer.write_report(log_path)
+    ml.step.get_hyperbolicity_log(solution.state).save(
+                        os.path.splitext(log_path)[0] + '_hyperbolicity.json')
     
     
     # ============
@@ -266,6 +333,8 @@ def sloped_shelf(num_cells,eigen_method,**kargs):
          htmlplot=kargs.get('htmlplot',False),iplot=kargs.get('iplot',False),
          file_format=controller.output_format,**plot_kargs)
 
+    return controller
+
 
 if __name__ == "__main__":
     # Run the test for the requested eigen methods for the jump and slope bathys
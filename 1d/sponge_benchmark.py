@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+r"""Benchmark the sponge layer on the jump shelf test
+
+Runs the jump shelf test on the full 400 km domain and on a domain half the
+size with a sponge layer at the open boundary, using the same grid spacing for
+both.  Reports the run time of each and the difference between the two in
+the top surface over the shelf, relative to the largest surface deviation on
+the full domain, for every output frame.
+
+"""
+
+import sys
+import time
+
+import numpy as np
+
+import multilayer as ml
+from shelf import jump_shelf
+
+def shelf_surface(controller,frame,shelf_edge):
+    r"""Return the top surface of *frame* over the cells with x > shelf_edge"""
+
+    solution = ml.output.read_solution(frame,path=controller.outdir)
+    rho = controller.solution.state.problem_data['rho']
+    x = solution.state.grid.dimensions[0].centers
+    shelf = x > shelf_edge
+    b = solution.state.aux[ml.aux.bathy_index,shelf]
+    eta = b + (solution.state.q[0,shelf] / rho[0]
+                    + solution.state.q[2,shelf] / rho[1])
+    return x[shelf],eta
+
+
+def timed_run(num_cells,eigen_method,**kargs):
+    r"""Run the jump shelf test returning the controller and the run time"""
+
+    start = time.time()
+    controller = jump_shelf(num_cells,eigen_method,htmlplot=False,iplot=False,
+                            **kargs)
+    return controller,time.time() - start
+
+
+def run_benchmark(num_cells=2000,eigen_method=2,sponge_width=50e3,
+                  shelf_edge=-30e3):
+    r"""Compare the full domain with the half domain plus sponge layer"""
+
+    full,full_time = timed_run(num_cells,eigen_method)
+    half,half_time = timed_run(num_cells / 2,eigen_method,
+                               domain_lower=-200e3,sponge_width=sponge_width)
+
+    print "%20s | %8s | %10s" % ("domain", "cells", "time (s)")
+    print "-" * 44
+    print "%20s | %8s | %10.2f" % ("400 km", num_cells, full_time)
+    print "%20s | %8s | %10.2f" % ("200 km + sponge", num_cells / 2, half_time)
+    print "Speedup: %.2f" % (full_time / half_time)
+    print
+
+    # Compare the surface over the shelf frame by frame
+    differences = []
+    scale = 0.0
+    for frame in xrange(full.num_output_times + 1):
+        x_full,eta_full = shelf_surface(full,frame,shelf_edge)
+        x_half,eta_half = shelf_surface(half,frame,shelf_edge)
+        if not np.allclose(x_full,x_half):
+            raise ValueError("The grids over the shelf do not line up.")
+        scale = max(scale,np.max(np.abs(eta_full)))
+        differences.append(np.max(np.abs(eta_full - eta_half)))
+    differences = np.array(differences) / max(scale,1e-16)
+
+    print "%8s | %15s" % ("frame", "rel. difference")
+    print "-" * 26
+    for (frame,difference) in enumerate(differences):
+        print "%8s | %15.3e" % (frame, difference)
+    print "Maximum relative difference: %.3e" % np.max(differences)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run_benchmark(int(sys.argv[1]))
+    else:
+        run_benchmark()
@@ -3,6 +3,7 @@
 
 r""" Run the suite of tests for the 1d two-layer equations"""
 
+import os
 import sys
 
 from clawpack.riemann import layered_shallow_water_1D
@@ -37,10 +38,17 @@ def wave_family(num_cells,eigen_method,wave_family,dry_state=True,**kargs):
     # =================
     # = Create Solver =
     # =================
-    if kargs.get('solver_type','classic') == 'classic':
+    solver_type = kargs.get('solver_type', 'classic')
+    if solver_type == 'classic':
         solver = pyclaw.ClawSolver1D(riemann_solver=layered_shallow_water_1D)
+        solver.limiters = 3
+        solver.source_split = 1
+    elif solver_type == 'sharpclaw':
+        solver = pyclaw.SharpClawSolver1D(
+                                    riemann_solver=layered_shallow_water_1D)
     else:
-        raise NotImplementedError('Classic is currently the only supported solver.')
+        raise NotImplementedError('Solver type %s is not supported.' 
+                                                                % solver_type)
         
     # Solver method parameters
     solver.cfl_desired = 0.9
@@ -48,8 +56,6 @@ def wave_family(num_cells,eigen_method,wave_family,dry_state=True,**kargs):
     solver.max_steps = 5000
     solver.fwave = True
     solver.kernel_language = 'Fortran'
-    solver.limiters = 3
-    solver.source_split = 1
         
     # Boundary conditions
     solver.bc_lower[0] = 1
@@ -61,7 +67,10 @@ def wave_family(num_cells,eigen_method,wave_family,dry_state=True,**kargs):
     solver.before_step = lambda solver,solution:ml.step.before_step(solver,solution)
                                             
     # Use simple friction source term
-    solver.step_source = ml.step.friction_source
+    if solver_type == 'classic':
+        solver.step_source = ml.step.friction_source
+    else:
+        solver.dq_src = ml.step.friction_source
     
     
     # ============================
@@ -71,8 +80,8 @@ def wave_family(num_cells,eigen_method,wave_family,dry_state=True,**kargs):
     
     x = pyclaw.Dimension(0.0, 1.0, num_cells)
     domain = pyclaw.Domain([x])
-    state = pyclaw.State(domain, 2 * num_layers, 3 + num_layers)
-    state.aux[ml.aux.kappa_index,:] = 0.0
+    state = pyclaw.State(domain, 2 * num_layers, ml.aux.num_aux(num_layers))
+    state.aux[ml.aux.kappa_slice(num_layers),:] = 0.0
 
     # Set physics data
     state.problem_data['g'] = 9.8
@@ -124,12 +133,26 @@ def wave_family(num_cells,eigen_method,wave_family,dry_state=True,**kargs):
     controller.num_output_times = 50
     controller.write_aux_init = True
     controller.outdir = outdir
-    controller.write_aux = True
     
+    # Write the static aux fields once and the wind and kappa every frame
+    if kargs.get('split_aux', True):
+        ml.output.SplitAuxOutput(num_layers).attach(controller)
+    else:
+        controller.write_aux_always = True
+    
+    # Optionally time each phase of the time step
+    if kargs.get('timing', False):
+        timer = ml.timing.StepTimer()
+        timer.instrument(solver, controller)
+
     # ==================
     # = Run Simulation =
     # ==================
     state = controller.run()
+    if kargs.get('timing', False):
+        timer.write_report(log_path)
+    ml.step.get_hyperbolicity_log(solution.state).save(
+                        os.path.splitext(log_path)[0] + '_hyperbolicity.json')
     
     # ============
     # = Plotting =
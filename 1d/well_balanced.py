@@ -3,6 +3,7 @@
 
 r"""Test case for well balancing"""
 
+import os
 import sys
 import numpy
 
@@ -35,10 +36,17 @@ def smooth_test(eigen_method, dry=False, **kargs):
     # =================
     # = Create Solver =
     # =================
-    if kargs.get('solver_type','classic') == 'classic':
+    solver_type = kargs.get('solver_type', 'classic')
+    if solver_type == 'classic':
         solver = pyclaw.ClawSolver1D(riemann_solver=layered_shallow_water_1D)
+        solver.limiters = 3
+        solver.source_split = 1
+    elif solver_type == 'sharpclaw':
+        solver = pyclaw.SharpClawSolver1D(
+                                    riemann_solver=layered_shallow_water_1D)
     else:
-        raise NotImplementedError('Classic is currently the only supported solver.')
+        raise NotImplementedError('Solver type %s is not supported.' 
+                                                                % solver_type)
         
     # Solver method parameters
     solver.cfl_desired = 0.9
@@ -46,8 +54,6 @@ def smooth_test(eigen_method, dry=False, **kargs):
     solver.max_steps = 5000
     solver.fwave = True
     solver.kernel_language = 'Fortran'
-    solver.limiters = 3
-    solver.source_split = 1
         
     # Boundary conditions
     # Use wall boundary condition at beach
@@ -56,12 +62,18 @@ def smooth_test(eigen_method, dry=False, **kargs):
     solver.aux_bc_lower[0] = 1
     solver.aux_bc_upper[0] = 1
 
-    # Set the before step function
-    solver.before_step = lambda solver,solution:ml.step.before_step(solver,
-                                                                    solution)
+    # Set the before step function, the solution is quasi-steady so kappa is
+    # only checked every 10 steps and at the output times
+    richardson_monitor = ml.step.RichardsonMonitor(interval=10)
+    solver.before_step = lambda solver, solution:ml.step.before_step(solver,
+                                    solution, 
+                                    richardson_monitor=richardson_monitor)
                                             
     # Use simple friction source term
-    solver.step_source = ml.step.friction_source
+    if solver_type == 'classic':
+        solver.step_source = ml.step.friction_source
+    else:
+        solver.dq_src = ml.step.friction_source
 
     
     # ============================
@@ -71,8 +83,8 @@ def smooth_test(eigen_method, dry=False, **kargs):
     
     x = pyclaw.Dimension(0.0, 10.0, 200)
     domain = pyclaw.Domain([x])
-    state = pyclaw.State(domain, 2 * num_layers, 3 + num_layers)
-    state.aux[ml.aux.kappa_index,:] = 0.0
+    state = pyclaw.State(domain, 2 * num_layers, ml.aux.num_aux(num_layers))
+    state.aux[ml.aux.kappa_slice(num_layers),:] = 0.0
 
     # Set physics data
     state.problem_data['g'] = 9.8
@@ -111,6 +123,7 @@ def smooth_test(eigen_method, dry=False, **kargs):
     controller = pyclaw.Controller()
     controller.solution = solution
     controller.solver = solver
+    richardson_monitor.controller = controller
     
     # Output parameters
     controller.output_style = 1
@@ -118,12 +131,26 @@ def smooth_test(eigen_method, dry=False, **kargs):
     controller.num_output_times = 1
     controller.write_aux_init = True
     controller.outdir = outdir
-    controller.write_aux = True
     
+    # Write the static aux fields once and the wind and kappa every frame
+    if kargs.get('split_aux', True):
+        ml.output.SplitAuxOutput(num_layers).attach(controller)
+    else:
+        controller.write_aux_always = True
+    
+    # Optionally time each phase of the time step
+    if kargs.get('timing', False):
+        timer = ml.timing.StepTimer()
+        timer.instrument(solver, controller)
+
     # ==================
     # = Run Simulation =
     # ==================
     state = controller.run()
+    if kargs.get('timing', False):
+        timer.write_report(log_path)
+    ml.step.get_hyperbolicity_log(solution.state).save(
+                        os.path.splitext(log_path)[0] + '_hyperbolicity.json')
     
     # ============
     # = Plotting =
@@ -159,10 +186,17 @@ def jump_test(eigen_method, dry=False, **kargs):
     # =================
     # = Create Solver =
     # =================
-    if kargs.get('solver_type','classic') == 'classic':
+    solver_type = kargs.get('solver_type', 'classic')
+    if solver_type == 'classic':
         solver = pyclaw.ClawSolver1D(riemann_solver=layered_shallow_water_1D)
+        solver.limiters = 3
+        solver.source_split = 1
+    elif solver_type == 'sharpclaw':
+        solver = pyclaw.SharpClawSolver1D(
+                                    riemann_solver=layered_shallow_water_1D)
     else:
-        raise NotImplementedError('Classic is currently the only supported solver.')
+        raise NotImplementedError('Solver type %s is not supported.' 
+                                                                % solver_type)
         
     # Solver method parameters
     solver.cfl_desired = 0.9
@@ -170,8 +204,6 @@ def jump_test(eigen_method, dry=False, **kargs):
     solver.max_steps = 5000
     solver.fwave = True
     solver.kernel_language = 'Fortran'
-    solver.limiters = 3
-    solver.source_split = 1
         
     # Boundary conditions
     # Use wall boundary condition at beach
@@ -180,12 +212,18 @@ def jump_test(eigen_method, dry=False, **kargs):
     solver.aux_bc_lower[0] = 1
     solver.aux_bc_upper[0] = 1
 
-    # Set the before step function
+    # Set the before step function, the solution is quasi-steady so kappa is
+    # only checked every 10 steps and at the output times
+    richardson_monitor = ml.step.RichardsonMonitor(interval=10)
     solver.before_step = lambda solver, solution:ml.step.before_step(solver,
-                                                                     solution)
+                                    solution, 
+                                    richardson_monitor=richardson_monitor)
                                             
     # Use simple friction source term
-    solver.step_source = ml.step.friction_source
+    if solver_type == 'classic':
+        solver.step_source = ml.step.friction_source
+    else:
+        solver.dq_src = ml.step.friction_source
 
     
     # ============================
@@ -195,8 +233,8 @@ def jump_test(eigen_method, dry=False, **kargs):
     
     x = pyclaw.Dimension(0.0,10.0,200)
     domain = pyclaw.Domain([x])
-    state = pyclaw.State(domain, 2 * num_layers, 3 + num_layers)
-    state.aux[ml.aux.kappa_index,:] = 0.0
+    state = pyclaw.State(domain, 2 * num_layers, ml.aux.num_aux(num_layers))
+    state.aux[ml.aux.kappa_slice(num_layers),:] = 0.0
 
     # Set physics data
     state.problem_data['g'] = 9.8
@@ -234,6 +272,7 @@ def jump_test(eigen_method, dry=False, **kargs):
     controller = pyclaw.Controller()
     controller.solution = solution
     controller.solver = solver
+    richardson_monitor.controller = controller
     
     # Output parameters
     controller.output_style = 1
@@ -241,12 +280,26 @@ def jump_test(eigen_method, dry=False, **kargs):
     controller.num_output_times = 1
     controller.write_aux_init = True
     controller.outdir = outdir
-    controller.write_aux = True
     
+    # Write the static aux fields once and the wind and kappa every frame
+    if kargs.get('split_aux', True):
+        ml.output.SplitAuxOutput(num_layers).attach(controller)
+    else:
+        controller.write_aux_always = True
+    
+    # Optionally time each phase of the time step
+    if kargs.get('timing', False):
+        timer = ml.timing.StepTimer()
+        timer.instrument(solver, controller)
+
     # ==================
     # = Run Simulation =
     # ==================
     state = controller.run()
+    if kargs.get('timing', False):
+        timer.write_report(log_path)
+    ml.step.get_hyperbolicity_log(solution.state).save(
+                        os.path.splitext(log_path)[0] + '_hyperbolicity.json')
     
     # ============
     # = Plotting =
@@ -6,7 +6,7 @@ import os
 
 import numpy
 
-import clawpack.pyclaw.solution as solution
+from multilayer.output import read_solution
 
 # Parameters
 sea_level = 0.0
@@ -68,7 +68,7 @@ if __name__ == '__main__':
             sol_path = os.path.join(data_path,"well_balancing_%s" % test,
                                                 "ml_e%s_d%s_output" % (eigen_method, dry))
 
-            sol = solution.Solution(1, path=sol_path, read_aux=True)
+            sol = read_solution(1, path=sol_path)
             if dry:
                 eta = [0.0, -6.0]
             else:
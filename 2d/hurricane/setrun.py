@@ -430,6 +430,21 @@ def set_multilayer(rundata):
     return rundata
 
 
+def profile_topo_func(profile):
+    """
+    Return a topo_func that is piecewise linear in x through the (x, z) points
+    in profile, evaluated with a single numpy.interp call.
+    """
+
+    x_points = numpy.array([point[0] for point in profile], dtype=float)
+    z_points = numpy.array([point[1] for point in profile], dtype=float)
+
+    def topo_func(x, y):
+        return numpy.interp(x, x_points, z_points)
+
+    return topo_func
+
+
 def write_topo_file(run_data, out_file, **kwargs):
 
     # Make topography
@@ -453,7 +468,7 @@ def write_topo_file(run_data, out_file, **kwargs):
                     (run_data.clawdata.upper[0], 
                             beach_slope * (run_data.clawdata.upper[0] - x2) 
                             + shelf_depth)]
-    topo.topo_func = topotools.create_topo_func(topo_profile)
+    topo.topo_func = profile_topo_func(topo_profile)
     topo.write(out_file)
 
     return topo